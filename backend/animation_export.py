@@ -0,0 +1,173 @@
+"""
+애니메이션 내보내기 - 생성된 프레임을 하나의 애니메이션 파일(WebP/APNG/GIF)로 저장
+
+A single looping preview is much smaller than the individual frames plus the
+combined sheet. Frames are scaled to a common height and centered on a
+shared canvas. GIF frames are quantized against one palette built from all
+frames, so colors do not flicker and the palette is stored once. All three
+encoders only store the region that changed from the previous frame: Pillow
+crops GIF/APNG frames to the difference bounding box, and libwebp does the
+same with `minimize_size`. Identical consecutive frames are merged into one
+frame with the summed duration.
+"""
+
+import os
+from typing import List, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+from PIL import Image, ImageChops
+
+from .sprite_compositor import compose_sprite_sheet, load_frames
+
+# Load environment variables before reading export settings
+load_dotenv()
+
+ANIMATION_EXPORT_FORMAT = os.getenv("ANIMATION_EXPORT_FORMAT", "webp").lower()
+ANIMATION_FRAME_MS = int(os.getenv("ANIMATION_FRAME_MS", "120"))
+ANIMATION_WEBP_QUALITY = int(os.getenv("ANIMATION_WEBP_QUALITY", "80"))
+
+EXPORT_EXTENSIONS = {"webp": ".webp", "apng": ".png", "gif": ".gif"}
+# GIF 투명 픽셀에 예약한 팔레트 인덱스
+_GIF_TRANSPARENT_INDEX = 255
+
+
+def _to_canvas(images: List[Image.Image], cell_height: int) -> List[Image.Image]:
+    width = max(image.width for image in images)
+    canvases = []
+    for image in images:
+        if image.width == width:
+            canvases.append(image)
+            continue
+        canvas = Image.new("RGBA", (width, cell_height), (0, 0, 0, 0))
+        canvas.paste(image, ((width - image.width) // 2, 0))
+        canvases.append(canvas)
+    return canvases
+
+
+def _merge_duplicates(frames: List[Image.Image], durations: List[int]):
+    merged_frames, merged_durations = [frames[0]], [durations[0]]
+    for frame, duration in zip(frames[1:], durations[1:]):
+        # alpha_only=False: RGBA의 getbbox는 기본적으로 알파 채널만 비교함
+        if ImageChops.difference(frame, merged_frames[-1]).getbbox(alpha_only=False) is None:
+            merged_durations[-1] += duration
+        else:
+            merged_frames.append(frame)
+            merged_durations.append(duration)
+    return merged_frames, merged_durations
+
+
+def _shared_palette_frames(frames: List[Image.Image]) -> List[Image.Image]:
+    """Quantize RGBA frames to one 255-color palette plus a transparent index."""
+    sheet, _layout = compose_sprite_sheet(frames)
+    palette_image = sheet.convert("RGB").quantize(colors=255, method=Image.Quantize.MEDIANCUT)
+    palette = palette_image.getpalette()[:255 * 3]
+    # 남는 슬롯(투명 인덱스 포함)은 0번 색으로 채움 - 검은 불투명 픽셀이 투명 인덱스로 가지 않도록
+    palette += palette[:3] * ((256 * 3 - len(palette)) // 3)
+    palette_image.putpalette(palette)
+
+    quantized = []
+    for frame in frames:
+        indexed = frame.convert("RGB").quantize(palette=palette_image, dither=Image.Dither.NONE)
+        # 255번과 0번은 같은 색이므로 255번으로 간 불투명 픽셀을 0번으로 옮겨도 결과는 같음
+        indexed.frombytes(indexed.tobytes().replace(bytes([_GIF_TRANSPARENT_INDEX]), b"\x00"))
+        transparent_mask = frame.getchannel("A").point(lambda alpha: 255 if alpha < 128 else 0)
+        indexed.paste(_GIF_TRANSPARENT_INDEX, mask=transparent_mask)
+        indexed.info["transparency"] = _GIF_TRANSPARENT_INDEX
+        quantized.append(indexed)
+    return quantized
+
+
+def export_animation(frames: Sequence[Union[str, Image.Image]], output_path: str,
+                     export_format: Optional[str] = None,
+                     durations: Optional[Union[int, Sequence[int]]] = None) -> str:
+    """
+    Write `frames` (paths or PIL images) as one looping animation.
+
+    `export_format` is "webp", "apng" or "gif" (default: ANIMATION_EXPORT_FORMAT).
+    `durations` is one value in milliseconds for every frame or one per frame.
+    Returns `output_path`.
+    """
+    export_format = (export_format or ANIMATION_EXPORT_FORMAT).lower()
+    if export_format not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported animation format: {export_format}")
+
+    images, cell_height = load_frames(frames)
+    if durations is None:
+        durations = ANIMATION_FRAME_MS
+    if isinstance(durations, int):
+        durations = [durations] * len(images)
+    if len(durations) != len(images):
+        raise ValueError("durations must have one entry per frame.")
+
+    images, durations = _merge_duplicates(_to_canvas(images, cell_height), list(durations))
+    first, rest = images[0], images[1:]
+
+    if export_format == "gif":
+        indexed = _shared_palette_frames(images)
+        indexed[0].save(
+            output_path, "GIF", save_all=True, append_images=indexed[1:], duration=durations,
+            loop=0, disposal=2, transparency=_GIF_TRANSPARENT_INDEX, optimize=False,
+        )
+    elif export_format == "apng":
+        first.save(
+            output_path, "PNG", save_all=True, append_images=rest, duration=durations,
+            loop=0, disposal=1, blend=0, optimize=True,
+        )
+    else:
+        first.save(
+            output_path, "WEBP", save_all=True, append_images=rest, duration=durations,
+            loop=0, quality=ANIMATION_WEBP_QUALITY, method=4, minimize_size=True, allow_mixed=True,
+        )
+
+    print(f"✅ Animation exported: {output_path} ({len(images)} frames, {os.path.getsize(output_path) // 1024}KB)")
+    return output_path
+
+
+def split_animation_result(image_paths: Sequence[str]):
+    """
+    Split an animation result into `(frame_paths, sheet_path)`.
+
+    The animation generators return the original reference first, then the
+    frames, then the combined sheet (if it was built); `sheet_path` is None
+    when there is no sheet.
+    """
+    frame_paths = list(image_paths[1:])
+    if frame_paths and "_combined_" in os.path.basename(frame_paths[-1]):
+        return frame_paths[:-1], frame_paths[-1]
+    return frame_paths, None
+
+
+def derived_output_base(frame_paths: Sequence[str], sheet_path: Optional[str], tag: str) -> str:
+    """Path without extension for a file derived from an animation result (`*_<tag>_*` next to the sheet)."""
+    if sheet_path:
+        sheet_dir, sheet_name = os.path.split(sheet_path)
+        return os.path.join(sheet_dir, os.path.splitext(sheet_name.replace("_combined_", f"_{tag}_"))[0])
+    return os.path.splitext(frame_paths[-1])[0] + f"_{tag}"
+
+
+def export_animation_preview(image_paths: Sequence[str], action_type: str,
+                             export_format: Optional[str] = None) -> Optional[str]:
+    """
+    Export the generated frames of an animation result as a single preview file.
+
+    `image_paths` is the list returned by the animation generators (see
+    `split_animation_result`). Only the generated frames are animated; the final pose of
+    a "dead" animation is held longer. The preview is written next to the
+    frames and reused if it already exists. Returns None when disabled or
+    when there are no frames.
+    """
+    export_format = (export_format or ANIMATION_EXPORT_FORMAT).lower()
+    if export_format == "none":
+        return None
+    frame_paths, sheet_path = split_animation_result(image_paths)
+    if not frame_paths:
+        return None
+
+    output_path = derived_output_base(frame_paths, sheet_path, "preview") + EXPORT_EXTENSIONS[export_format]
+    if os.path.exists(output_path):
+        return output_path
+
+    durations = [ANIMATION_FRAME_MS] * len(frame_paths)
+    if action_type == "dead":
+        durations[-1] = ANIMATION_FRAME_MS * 4
+    return export_animation(frame_paths, output_path, export_format, durations)
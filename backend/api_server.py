@@ -1,5 +1,8 @@
+import asyncio
+import functools
+import json
 import os
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any
 
 from fastapi import (
@@ -10,15 +13,21 @@ from fastapi import (
     Depends,
     Header,
     HTTPException,
+    Query,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from .supabase_client import (
     validate_access_token,
-    ensure_user_token_balance,
     get_user_token_balance,
     consume_user_token,
+    refund_user_token,
     record_generated_image,
+    record_generated_images,
+    upload_generated_files,
+    list_generated_images,
     get_last_generated_image_url,
     sign_up_user,
     sign_in_user,
@@ -32,8 +41,29 @@ from .game_asset_app import (
     generate_universal_animation,
     build_user_preferences,
 )
+from .game_asset_generator import EncodedImage
+from .animation_export import export_animation_preview
+from .texture_atlas import atlas_descriptor_paths, build_animation_atlas
+from .gradio_animation import animation_frame_count, sprite_animation_zip_entries
+from .job_queue import get_global_job_queue, PRIVATE_RESULT_KEY, STATUS_SUCCEEDED, TERMINAL_STATUSES
+from .zip_stream import iter_zip
+from .output_janitor import get_global_janitor, start_output_janitor
+from .output_naming import new_output_path, new_ulid
 from .pixel_character_generator import generate_pixel_character_interface
 
+# Gemini 생성 작업은 이벤트 루프 밖의 전용 스레드 풀에서 실행
+API_GENERATION_WORKERS = int(os.getenv("API_GENERATION_WORKERS", "32"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# 다른 워커 프로세스가 실행 중인 작업은 이벤트가 오지 않으므로 이 간격으로 DB를 다시 읽음
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "1"))
+# 생성 결과를 로컬 디스크에도 저장할지 여부 (기본: 메모리에서 바로 Storage로 업로드)
+API_PERSIST_OUTPUTS = os.getenv("API_PERSIST_OUTPUTS", "false").lower() in ("1", "true", "yes")
+API_MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "data/output")
+# 업로드는 생성기의 references 폴더에 바로 저장 (save_reference_image가 다시 복사하지 않음)
+UPLOAD_DIR = os.path.join(OUTPUT_DIR, "references")
+
 
 def create_app() -> FastAPI:
     app = FastAPI(title="Sprite Studio API")
@@ -71,6 +101,24 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    generation_executor = ThreadPoolExecutor(
+        max_workers=API_GENERATION_WORKERS, thread_name_prefix="generation"
+    )
+
+    @app.on_event("startup")
+    def _start_output_janitor() -> None:
+        start_output_janitor()
+
+    @app.on_event("shutdown")
+    def _shutdown_generation_executor() -> None:
+        generation_executor.shutdown(wait=False, cancel_futures=True)
+        get_global_janitor().stop()
+
+    async def _run_generation(func, *args, **kwargs):
+        """Run a blocking generation call on the bounded generation pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(generation_executor, functools.partial(func, *args, **kwargs))
+
     def _optional(value: Optional[str]) -> Optional[str]:
         if value is None:
             return None
@@ -80,15 +128,33 @@ def create_app() -> FastAPI:
         return value
 
     async def _save_upload(upload: Optional[UploadFile]) -> Optional[str]:
+        """Stream an upload to disk in chunks, rejecting it with 413 past API_MAX_UPLOAD_BYTES."""
         if upload is None:
             return None
+        if upload.size is not None and upload.size > API_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Uploaded file is too large.")
         suffix = os.path.splitext(upload.filename or "")[1] or ".png"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            contents = await upload.read()
-            tmp.write(contents)
-            return tmp.name
+        path = new_output_path(UPLOAD_DIR, "upload", suffix)
+        written = 0
+        try:
+            with open(path, "wb") as file_handle:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > API_MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+                    await run_in_threadpool(file_handle.write, chunk)
+        except BaseException:
+            _cleanup_temp(path)
+            raise
+        # 대기 중인 작업의 입력이 정리되지 않도록 _cleanup_temp까지 고정
+        get_global_janitor().pin(path)
+        return path
 
     def _cleanup_temp(*paths: Optional[str]) -> None:
+        get_global_janitor().unpin(*paths)
         for path in paths:
             if path and os.path.exists(path):
                 try:
@@ -96,29 +162,151 @@ def create_app() -> FastAPI:
                 except OSError:
                     pass
 
-    def _tokens_or_402(user_session: Dict[str, Any]) -> None:
-        if user_session.get("tokens", 0) <= 0:
-            raise HTTPException(status_code=402, detail="No tokens remaining.")
+    def _refund_token(user_id: str) -> None:
+        try:
+            refund_user_token(user_id)
+        except Exception as refund_error:  # noqa: BLE001
+            print(f"⚠️ Failed to refund token for {user_id}: {refund_error}")
+
+    def _record_image_set(user_id: str, image_paths, image_type: str, metadata: Dict[str, Any],
+                          extras: Optional[Dict[str, tuple]] = None, first_frame: int = 0):
+        """
+        Upload every image of a multi-frame result; the last one (the sheet/preview) keeps `image_type`.
+
+        Frames start at `image_paths[first_frame]`; animation results pass 1 to
+        skip the user's reference image, so `frame_index` 0 is the first generated frame.
+
+        `extras` maps a suffix to `(path, metadata)` for derived files (e.g. the
+        animated preview or the texture atlas), recorded as `<image_type>_<suffix>`.
+        Returns `(image_urls, extra_urls)`.
+        """
+        extras = {suffix: extra for suffix, extra in (extras or {}).items() if extra[0]}
+        images = [
+            (f"{image_type}_frame", path, dict(metadata, frame_index=index))
+            for index, path in enumerate(image_paths[first_frame:-1])
+        ]
+        for suffix, (path, extra_metadata) in extras.items():
+            images.append((f"{image_type}_{suffix}", path, dict(metadata, **extra_metadata)))
+        images.append((image_type, image_paths[-1], metadata))
+        urls = record_generated_images(user_id, images)
+        extra_count = len(extras)
+        extra_urls = dict(zip(extras, urls[-1 - extra_count:-1]))
+        image_urls = urls[:len(urls) - 1 - extra_count] + urls[-1:]
+        return image_urls, extra_urls
+
+    def _complete_sprites(user_id: str, image_paths, status: str, character_description: str,
+                          actions_text: str, remaining: int) -> Dict[str, Any]:
+        """Record the sprite result (blocking). The token was reserved when the request came in."""
+        metadata = {
+            "description": character_description,
+            "actions": actions_text,
+        }
+        image_urls, _ = _record_image_set(user_id, image_paths, "sprite_sheet", metadata)
+        return {
+            "message": status,
+            "image_urls": image_urls,
+            "preview_url": image_urls[-1],
+            "tokens": remaining,
+            "last_image_url": image_urls[-1],
+        }
+
+    def _complete_animation(user_id: str, image_paths, status: str, action_type: str,
+                            remaining: int) -> Dict[str, Any]:
+        """Record the animation result (blocking). The token was reserved when the request came in."""
+        metadata = {"action_type": action_type}
+        try:
+            animation_path = export_animation_preview(image_paths, action_type)
+        except Exception as export_error:  # noqa: BLE001
+            print(f"⚠️ Failed to export animation preview: {export_error}")
+            animation_path = None
+        try:
+            atlas_path, atlas_data = build_animation_atlas(image_paths, action_type)
+        except Exception as atlas_error:  # noqa: BLE001
+            print(f"⚠️ Failed to build texture atlas: {atlas_error}")
+            atlas_path, atlas_data = None, None
+        descriptor_urls = {}
+        if atlas_path:
+            # 엔진이 읽는 JSON/XML 디스크립터도 PNG 옆에 업로드
+            descriptors = atlas_descriptor_paths(atlas_path)
+            descriptor_urls = dict(zip(descriptors, upload_generated_files(user_id, list(descriptors.values()))))
+        image_urls, extra_urls = _record_image_set(
+            user_id, image_paths, f"animation_{action_type}", metadata,
+            {
+                "animated": (animation_path, {}),
+                # 프레임 좌표/오프셋/피벗과 디스크립터 URL은 metadata 컬럼에 함께 저장
+                "atlas": (atlas_path, {
+                    "atlas": atlas_data,
+                    "atlas_json_url": descriptor_urls.get("json"),
+                    "atlas_xml_url": descriptor_urls.get("xml"),
+                }),
+            },
+            first_frame=1,
+        )
+        return {
+            "message": status,
+            "image_urls": image_urls,
+            "preview_url": image_urls[-1],
+            "animation_url": extra_urls.get("animated"),
+            "atlas_url": extra_urls.get("atlas"),
+            "atlas_json_url": descriptor_urls.get("json"),
+            "atlas_xml_url": descriptor_urls.get("xml"),
+            "atlas": atlas_data,
+            "tokens": remaining,
+            "last_image_url": image_urls[-1],
+        }
 
     def _auth_dependency(authorization: str = Header(...)) -> Dict[str, Any]:
         if not authorization.lower().startswith("bearer "):
             raise HTTPException(status_code=401, detail="Invalid Authorization header.")
         raw_token = authorization.split(" ", 1)[1].strip()
-        claims = validate_access_token(raw_token)
+        return _authenticate(raw_token)
+
+    def _stream_auth_dependency(
+        authorization: Optional[str] = Header(None),
+        access_token: Optional[str] = Query(None),
+    ) -> Dict[str, Any]:
+        # 브라우저 EventSource는 헤더를 보낼 수 없으므로 쿼리스트링 토큰도 허용
+        if authorization:
+            return _auth_dependency(authorization)
+        if not access_token:
+            raise HTTPException(status_code=401, detail="Missing access token.")
+        return _authenticate(access_token.strip())
+
+    def _authenticate(raw_token: str) -> Dict[str, Any]:
+        try:
+            claims = validate_access_token(raw_token)
+        except ValueError as exc:
+            raise HTTPException(status_code=401, detail=str(exc)) from exc
         user_id = claims.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token claims.")
-        tokens = ensure_user_token_balance(user_id)
+        # 잔액은 조회하지 않음 - 생성 요청은 _token_reservation이 차감하면서 확인하고 /profile은 따로 조회
         return {
             "user_id": user_id,
-            "tokens": tokens,
             "access_token": raw_token,
         }
 
+    def _token_reservation(user=Depends(_auth_dependency)):
+        """
+        Charge one token before any generation work starts and yield the remaining balance.
+
+        Charging up front means a user cannot start (or queue) more generations
+        than they have tokens. If the request fails, the token is refunded.
+        """
+        try:
+            remaining = consume_user_token(user["user_id"])
+        except ValueError as exc:
+            raise HTTPException(status_code=402, detail="No tokens remaining.") from exc
+        try:
+            yield remaining
+        except BaseException:
+            _refund_token(user["user_id"])
+            raise
+
     @app.post("/auth/signup")
     async def api_sign_up(email: str = Form(...), password: str = Form(...)):
         try:
-            response = sign_up_user(email, password)
+            response = await run_in_threadpool(sign_up_user, email, password)
             return {"message": "Check your inbox to verify the account.", "data": response}
         except Exception as exc:  # noqa: BLE001
             raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -126,7 +314,7 @@ def create_app() -> FastAPI:
     @app.post("/auth/login")
     async def api_login(email: str = Form(...), password: str = Form(...)):
         try:
-            response = sign_in_user(email, password)
+            response = await run_in_threadpool(sign_in_user, email, password)
             session = getattr(response, "session", None)
             user = getattr(response, "user", None)
             if not session or not user:
@@ -148,17 +336,45 @@ def create_app() -> FastAPI:
     @app.post("/auth/logout")
     async def api_logout():
         try:
-            sign_out_user()
+            await run_in_threadpool(sign_out_user)
         except Exception:
             pass
         return {"message": "Signed out."}
 
+    @app.get("/health")
+    async def health():
+        """Liveness check plus output janitor counters (files removed, bytes reclaimed per directory)."""
+        return {"status": "ok", "output_janitor": get_global_janitor().stats()}
+
     @app.get("/profile")
     async def profile(user=Depends(_auth_dependency)):
-        last_image = get_last_generated_image_url(user["user_id"])
-        tokens = get_user_token_balance(user["user_id"])
+        last_image, tokens = await asyncio.gather(
+            run_in_threadpool(get_last_generated_image_url, user["user_id"]),
+            run_in_threadpool(get_user_token_balance, user["user_id"]),
+        )
         return {"user_id": user["user_id"], "tokens": tokens, "last_image_url": last_image}
 
+    @app.get("/assets")
+    async def list_assets(
+        limit: int = Query(24, ge=1, le=100),
+        cursor: Optional[str] = Query(None),
+        image_type: Optional[str] = Query(None),
+        project_id: Optional[str] = Query(None),
+        user=Depends(_auth_dependency),
+    ):
+        try:
+            rows, next_cursor = await run_in_threadpool(
+                list_generated_images,
+                user["user_id"],
+                limit,
+                cursor=cursor,
+                image_type=image_type,
+                project_id=project_id,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return {"items": rows, "next_cursor": next_cursor}
+
     @app.post("/generate/character")
     async def generate_character(
         character_description: str = Form(...),
@@ -176,22 +392,32 @@ def create_app() -> FastAPI:
         lock_aspect_ratio: bool = Form(False),
         use_percentage: bool = Form(False),
         pixel_mode: bool = Form(False),
+        bypass_cache: bool = Form(False),
         user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
     ):
-        _tokens_or_402(user)
         char_ref = await _save_upload(character_reference_image)
-        item_ref = await _save_upload(item_reference_image)
+        try:
+            item_ref = await _save_upload(item_reference_image)
+        except BaseException:
+            _cleanup_temp(char_ref)
+            raise
         try:
             if pixel_mode:
-                status, img_path = generate_pixel_character_interface(
+                status, img_path = await _run_generation(
+                    generate_pixel_character_interface,
                     character_description,
                     character_reference_image=char_ref,
                     item_reference_image=item_ref,
+                    return_bytes=not API_PERSIST_OUTPUTS,
                 )
+                if img_path and not API_PERSIST_OUTPUTS:
+                    img_path = EncodedImage(f"character_pixel_{new_ulid()}.png", img_path)
             else:
                 width = int(image_width) if image_width else None
                 height = int(image_height) if image_height else None
-                img_path, status = generate_character_interface(
+                img_path, status = await _run_generation(
+                    generate_character_interface,
                     character_description,
                     _optional(art_style),
                     _optional(mood),
@@ -206,17 +432,19 @@ def create_app() -> FastAPI:
                     height,
                     lock_aspect_ratio,
                     use_percentage,
+                    bypass_cache=bypass_cache,
+                    persist=API_PERSIST_OUTPUTS,
                 )
             if not img_path:
                 raise HTTPException(status_code=400, detail=status)
 
-            remaining = consume_user_token(user["user_id"])
             metadata = {
                 "description": character_description,
                 "art_style": art_style,
                 "pixel_mode": pixel_mode,
             }
-            public_url = record_generated_image(
+            public_url = await run_in_threadpool(
+                record_generated_image,
                 user["user_id"],
                 "character_pixel" if pixel_mode else "character",
                 img_path,
@@ -245,14 +473,16 @@ def create_app() -> FastAPI:
         image_height: Optional[str] = Form(None),
         lock_aspect_ratio: bool = Form(False),
         use_percentage: bool = Form(False),
+        bypass_cache: bool = Form(False),
         user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
     ):
-        _tokens_or_402(user)
         ref_path = await _save_upload(reference_image)
         try:
             width = int(image_width) if image_width else None
             height = int(image_height) if image_height else None
-            img_path, status = generate_item_interface(
+            img_path, status = await _run_generation(
+                generate_item_interface,
                 item_description,
                 _optional(art_style),
                 _optional(mood),
@@ -265,16 +495,18 @@ def create_app() -> FastAPI:
                 height,
                 lock_aspect_ratio,
                 use_percentage,
+                bypass_cache=bypass_cache,
+                persist=API_PERSIST_OUTPUTS,
             )
             if not img_path:
                 raise HTTPException(status_code=400, detail=status)
 
-            remaining = consume_user_token(user["user_id"])
             metadata = {
                 "description": item_description,
                 "art_style": art_style,
             }
-            public_url = record_generated_image(
+            public_url = await run_in_threadpool(
+                record_generated_image,
                 user["user_id"],
                 "item",
                 img_path,
@@ -306,13 +538,14 @@ def create_app() -> FastAPI:
         lock_aspect_ratio: bool = Form(False),
         use_percentage: bool = Form(False),
         user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
     ):
-        _tokens_or_402(user)
         ref_path = await _save_upload(reference_image)
         try:
             width = int(image_width) if image_width else None
             height = int(image_height) if image_height else None
-            image_paths, status = generate_character_sprites_interface(
+            image_paths, status = await _run_generation(
+                generate_character_sprites_interface,
                 character_description,
                 actions_text,
                 _optional(art_style),
@@ -331,25 +564,15 @@ def create_app() -> FastAPI:
             if not image_paths:
                 raise HTTPException(status_code=400, detail=status)
 
-            remaining = consume_user_token(user["user_id"])
-            preview_path = image_paths[-1]
-            metadata = {
-                "description": character_description,
-                "actions": actions_text,
-            }
-            public_url = record_generated_image(
+            return await run_in_threadpool(
+                _complete_sprites,
                 user["user_id"],
-                "sprite_sheet",
-                preview_path,
-                metadata=metadata,
+                image_paths,
+                status,
+                character_description,
+                actions_text,
+                remaining,
             )
-            return {
-                "message": status,
-                "image_urls": image_paths,
-                "preview_url": public_url,
-                "tokens": remaining,
-                "last_image_url": public_url,
-            }
         finally:
             _cleanup_temp(ref_path)
 
@@ -367,12 +590,14 @@ def create_app() -> FastAPI:
         image_height: Optional[str] = Form(None),
         lock_aspect_ratio: bool = Form(False),
         use_percentage: bool = Form(False),
+        bypass_cache: bool = Form(False),
         user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
     ):
-        _tokens_or_402(user)
         width = int(image_width) if image_width else None
         height = int(image_height) if image_height else None
-        img_path, status = generate_background_interface(
+        img_path, status = await _run_generation(
+            generate_background_interface,
             background_description,
             orientation,
             _optional(art_style),
@@ -385,16 +610,18 @@ def create_app() -> FastAPI:
             height,
             lock_aspect_ratio,
             use_percentage,
+            bypass_cache=bypass_cache,
+            persist=API_PERSIST_OUTPUTS,
         )
         if not img_path:
             raise HTTPException(status_code=400, detail=status)
 
-        remaining = consume_user_token(user["user_id"])
         metadata = {
             "description": background_description,
             "orientation": orientation,
         }
-        public_url = record_generated_image(
+        public_url = await run_in_threadpool(
+            record_generated_image,
             user["user_id"],
             "background",
             img_path,
@@ -412,33 +639,278 @@ def create_app() -> FastAPI:
         reference_image: UploadFile = File(...),
         action_type: str = Form("attack"),
         user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
     ):
-        _tokens_or_402(user)
         ref_path = await _save_upload(reference_image)
         try:
-            image_paths, status = generate_universal_animation(ref_path, action_type)
+            image_paths, status = await _run_generation(generate_universal_animation, ref_path, action_type)
             if not image_paths:
                 raise HTTPException(status_code=400, detail=status)
 
-            remaining = consume_user_token(user["user_id"])
-            preview_path = image_paths[-1]
-            metadata = {"action_type": action_type}
-            public_url = record_generated_image(
-                user["user_id"],
-                f"animation_{action_type}",
-                preview_path,
-                metadata=metadata,
+            return await run_in_threadpool(
+                _complete_animation, user["user_id"], image_paths, status, action_type, remaining
             )
-            return {
-                "message": status,
-                "image_urls": image_paths,
-                "preview_url": public_url,
-                "tokens": remaining,
-                "last_image_url": public_url,
-            }
         finally:
             _cleanup_temp(ref_path)
 
+    # ------------------------------------------------------------------
+    # Background jobs: submit returns a job ID, GET /jobs/{id} polls status
+    # ------------------------------------------------------------------
+
+    @app.post("/jobs/animation", status_code=202)
+    async def submit_animation_job(
+        reference_image: UploadFile = File(...),
+        action_type: str = Form("attack"),
+        user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
+    ):
+        ref_path = await _save_upload(reference_image)
+        user_id = user["user_id"]
+
+        def _run_job(on_frame):
+            try:
+                image_paths, status = generate_universal_animation(ref_path, action_type, on_frame=on_frame)
+                if not image_paths:
+                    raise RuntimeError(status)
+                result = _complete_animation(user_id, image_paths, status, action_type, remaining)
+                # GET /jobs/{id}/download에서 ZIP으로 스트리밍할 로컬 파일 목록 (공개 result에는 넣지 않음)
+                result[PRIVATE_RESULT_KEY] = {
+                    "archive": [
+                        [arcname, os.path.relpath(path, OUTPUT_DIR)]
+                        for arcname, path in sprite_animation_zip_entries(image_paths)
+                    ],
+                }
+            except BaseException:
+                # 예약한 토큰은 작업 큐가 실패 처리하면서 환불
+                _cleanup_temp(ref_path)
+                raise
+            # 원본은 ZIP의 00_original.png로 쓰이므로 지우지 않고 references 보관 정책에 맡김
+            get_global_janitor().unpin(ref_path)
+            return result
+
+        job_id = await run_in_threadpool(
+            get_global_job_queue().submit,
+            "animation",
+            _run_job,
+            user_id=user_id,
+            total_frames=animation_frame_count(action_type),
+            reserved_tokens=1,
+        )
+        return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+    @app.post("/jobs/sprites", status_code=202)
+    async def submit_sprites_job(
+        character_description: str = Form(...),
+        actions_text: str = Form(...),
+        art_style: str = Form("None"),
+        mood: str = Form("None"),
+        color_palette: str = Form("None"),
+        character_style: str = Form("None"),
+        line_style: str = Form("None"),
+        composition: str = Form("None"),
+        additional_notes: str = Form(""),
+        reference_image: Optional[UploadFile] = File(None),
+        image_width: Optional[str] = Form(None),
+        image_height: Optional[str] = Form(None),
+        lock_aspect_ratio: bool = Form(False),
+        use_percentage: bool = Form(False),
+        user=Depends(_auth_dependency),
+        remaining: int = Depends(_token_reservation),
+    ):
+        actions = [action.strip() for action in actions_text.split(",") if action.strip()]
+        if not actions:
+            raise HTTPException(status_code=400, detail="Please provide at least one action separated by commas.")
+        width = int(image_width) if image_width else None
+        height = int(image_height) if image_height else None
+        ref_path = await _save_upload(reference_image)
+        user_id = user["user_id"]
+
+        def _run_job(on_frame):
+            try:
+                image_paths, status = generate_character_sprites_interface(
+                    character_description,
+                    actions_text,
+                    _optional(art_style),
+                    _optional(mood),
+                    _optional(color_palette),
+                    _optional(character_style),
+                    _optional(line_style),
+                    _optional(composition),
+                    additional_notes,
+                    ref_path,
+                    width,
+                    height,
+                    lock_aspect_ratio,
+                    use_percentage,
+                    on_frame=on_frame,
+                )
+                if not image_paths:
+                    raise RuntimeError(status)
+                return _complete_sprites(
+                    user_id, image_paths, status, character_description, actions_text, remaining
+                )
+            finally:
+                _cleanup_temp(ref_path)
+
+        job_id = await run_in_threadpool(
+            get_global_job_queue().submit,
+            "sprites",
+            _run_job,
+            user_id=user_id,
+            total_frames=len(actions),
+            reserved_tokens=1,
+        )
+        return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+    def _public_frame(job_id: str, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """Frame progress as sent to clients: finished frames link to `/jobs/{id}/frames/{index}`."""
+        frame = dict(frame)
+        # 이전 버전이 progress에 저장한 로컬 경로는 내보내지 않음
+        frame.pop("path", None)
+        if frame.get("status") == "done":
+            frame["url"] = f"/jobs/{job_id}/frames/{frame['index']}"
+        return frame
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str, user=Depends(_auth_dependency)):
+        job = await run_in_threadpool(get_global_job_queue().get, job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        result = job["result"]
+        if result and (job["private"] or {}).get("archive"):
+            result["download_url"] = f"/jobs/{job_id}/download"
+        progress = dict(job["progress"])
+        progress["frames"] = [_public_frame(job_id, frame) for frame in progress.get("frames", [])]
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "progress": progress,
+            "result": job["result"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    @app.get("/jobs/{job_id}/download")
+    async def download_job_archive(job_id: str, user=Depends(_auth_dependency)):
+        """Stream the job's images as a ZIP (stored, not deflated) without writing it to disk."""
+        job = await run_in_threadpool(get_global_job_queue().get, job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        archive = (job["private"] or {}).get("archive")
+        if job["status"] != STATUS_SUCCEEDED or not archive:
+            raise HTTPException(status_code=409, detail="Job has no downloadable result.")
+
+        output_root = os.path.realpath(OUTPUT_DIR)
+        entries = []
+        for arcname, relative_path in archive:
+            path = os.path.realpath(os.path.join(output_root, relative_path))
+            if os.path.commonpath([output_root, path]) == output_root and os.path.exists(path):
+                entries.append((arcname, path))
+        if not entries:
+            raise HTTPException(status_code=410, detail="Job files are no longer available.")
+
+        def _stream_archive():
+            with get_global_janitor().in_use(*(path for _arcname, path in entries)):
+                yield from iter_zip(entries)
+
+        # 동기 제너레이터는 Starlette가 스레드 풀에서 순회하므로 파일 읽기가 이벤트 루프를 막지 않음
+        return StreamingResponse(
+            _stream_archive(),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{job["kind"]}_{job_id}.zip"'},
+        )
+
+    @app.get("/jobs/{job_id}/frames/{index}")
+    async def get_job_frame(job_id: str, index: int, user=Depends(_stream_auth_dependency)):
+        """Serve one finished frame of a job while it is still running (or after it finished)."""
+        job = await run_in_threadpool(get_global_job_queue().get, job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        frame_path = ((job["private"] or {}).get("frames") or {}).get(str(index))
+        if not frame_path:
+            raise HTTPException(status_code=404, detail="Frame not found.")
+        output_root = os.path.realpath(OUTPUT_DIR)
+        path = os.path.realpath(frame_path)
+        if os.path.commonpath([output_root, path]) != output_root or not os.path.exists(path):
+            raise HTTPException(status_code=410, detail="Frame is no longer available.")
+        return FileResponse(path, headers={"Cache-Control": "private, max-age=3600"})
+
+    def _sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    @app.get("/jobs/{job_id}/events")
+    async def stream_job_events(job_id: str, user=Depends(_stream_auth_dependency)):
+        """Server-Sent Events: one `frame` event per finished frame, then `succeeded` or `failed`."""
+        job_queue = get_global_job_queue()
+        # 스냅샷보다 먼저 구독해야 그 사이에 끝난 프레임을 놓치지 않음
+        events = job_queue.subscribe(job_id)
+        job = await run_in_threadpool(job_queue.get, job_id)
+        if not job or job["user_id"] != user["user_id"]:
+            job_queue.unsubscribe(job_id, events)
+            raise HTTPException(status_code=404, detail="Job not found.")
+
+        sent_frames = set()
+
+        def _snapshot_events(snapshot):
+            """SSE messages for frames not sent yet, plus the terminal event if the job is finished."""
+            messages = []
+            progress = snapshot["progress"]
+            for frame in progress.get("frames", []):
+                if frame["index"] in sent_frames:
+                    continue
+                sent_frames.add(frame["index"])
+                frame = _public_frame(job_id, frame)
+                messages.append(_sse("frame", dict(frame, completed=progress.get("completed"), total=progress.get("total"))))
+            if snapshot["status"] in TERMINAL_STATUSES:
+                messages.append(_sse(snapshot["status"], {"result": snapshot["result"], "error": snapshot["error"]}))
+            return messages
+
+        async def _event_stream():
+            try:
+                for message in _snapshot_events(job):
+                    yield message
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+
+                loop = asyncio.get_running_loop()
+                last_sent = loop.time()
+                while True:
+                    try:
+                        event, data = await asyncio.wait_for(events.get(), timeout=SSE_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        # 이 프로세스가 실행하지 않는 작업도 진행 상황이 전달되도록 DB 스냅샷으로 보충
+                        snapshot = await run_in_threadpool(job_queue.get, job_id)
+                        if snapshot is None:
+                            return
+                        for message in _snapshot_events(snapshot):
+                            yield message
+                            last_sent = loop.time()
+                        if snapshot["status"] in TERMINAL_STATUSES:
+                            return
+                        if loop.time() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                            yield ": keep-alive\n\n"
+                            last_sent = loop.time()
+                        continue
+                    if event == "frame":
+                        if data["index"] in sent_frames:
+                            continue
+                        sent_frames.add(data["index"])
+                        data = _public_frame(job_id, data)
+                    yield _sse(event, data)
+                    last_sent = loop.time()
+                    if event in TERMINAL_STATUSES:
+                        return
+            finally:
+                job_queue.unsubscribe(job_id, events)
+
+        return StreamingResponse(
+            _event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     return app
 
 
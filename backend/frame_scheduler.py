@@ -0,0 +1,102 @@
+"""애니메이션 프레임 동시 생성 스케줄러"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .gemini_retry import is_quota_error, retry_budget
+from .output_naming import new_output_path
+
+# Number of frames that may be in flight against Gemini at the same time.
+DEFAULT_FRAME_WORKERS = int(os.getenv("FRAME_WORKERS", "3"))
+
+
+def _generate_frame(generator, frame_name, prompt, reference_img, output_path, stop_event):
+    """Generate and save a single frame. Never raises; failures are reported in the result."""
+    result = {
+        "frame_name": frame_name,
+        "path": None,
+        "error": None,
+        "quota_exceeded": False,
+        "elapsed": 0.0,
+    }
+    if stop_event.is_set():
+        result["error"] = "skipped after quota limit"
+        return result
+
+    started = time.perf_counter()
+    print(f"🎨 Generating {frame_name}...")
+    try:
+        response = generator.image_gen_client.models.generate_content(
+            model=generator.image_gen_model_name,
+            contents=[prompt, reference_img]
+        )
+        saved_image = generator.save_image(response, output_path)
+        if saved_image:
+            result["path"] = output_path
+            print(f"✅ {frame_name} saved: {output_path}")
+        else:
+            result["error"] = "no image in response"
+            print(f"⚠️ Failed to save {frame_name}")
+    except Exception as frame_error:
+        result["error"] = str(frame_error)
+        if is_quota_error(frame_error):
+            result["quota_exceeded"] = True
+            # 남은 프레임은 보내지 않음 (할당량 소진 시 추가 요청은 모두 실패)
+            stop_event.set()
+            print(f"⚠️ {frame_name} failed due to quota limit")
+        else:
+            print(f"⚠️ {frame_name} failed: {frame_error}")
+    finally:
+        result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def generate_frames_concurrently(generator, frame_prompts, reference_img, output_dir, file_prefix,
+                                 max_workers=None, on_frame=None):
+    """
+    Generate every frame in `frame_prompts` through a bounded worker pool.
+
+    Returns one result dict per frame, in the same order as `frame_prompts`,
+    with keys `frame_name`, `path` (None on failure), `error`,
+    `quota_exceeded` and `elapsed`. `on_frame(index, result)` is called as
+    soon as each frame finishes so callers can surface partial progress.
+    Transient errors are retried by the client, drawing on one retry budget
+    shared by all frames of this call.
+    """
+    frame_items = list(frame_prompts.items())
+    if not frame_items:
+        return []
+
+    workers = max(1, min(max_workers or DEFAULT_FRAME_WORKERS, len(frame_items)))
+
+    # PIL 이미지가 전달되면 lazy loading이므로 여러 스레드에서 동시에 디코딩하지 않도록 미리 로드
+    if hasattr(reference_img, "load"):
+        reference_img.load()
+
+    stop_event = threading.Event()
+    results = [None] * len(frame_items)
+
+    def _run(index, frame_name, prompt):
+        output_path = new_output_path(output_dir, f"{file_prefix}_{frame_name}")
+        result = _generate_frame(generator, frame_name, prompt, reference_img, output_path, stop_event)
+        results[index] = result
+        if on_frame is not None:
+            try:
+                on_frame(index, result)
+            except Exception as callback_error:
+                print(f"⚠️ Frame progress callback failed: {callback_error}")
+        return result
+
+    # 애니메이션 한 번의 모든 프레임이 하나의 재시도 예산을 공유
+    with retry_budget(), ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run, index, frame_name, prompt)
+            for index, (frame_name, prompt) in enumerate(frame_items)
+        ]
+        for future in futures:
+            future.result()
+
+    return results
@@ -1,5 +1,7 @@
 import gradio as gr
 import os
+import queue
+import threading
 import time
 from typing import Dict
 
@@ -21,6 +23,7 @@ from .supabase_client import (
     get_user_token_balance,
     consume_user_token,
     record_generated_image,
+    record_generated_images,
     get_last_generated_image_url,
     validate_access_token,
 )
@@ -54,6 +57,7 @@ from .gradio_animation import (
     generate_sprite_animation,
     generate_dead_animation,
     generate_universal_animation,
+    animation_frame_count,
     update_animation_info,
 )
 from .gradio_config_management import (
@@ -70,6 +74,7 @@ from .gradio_ui_components import (
 )
 from .gradio_event_handlers import _setup_event_handlers
 from .gradio_styles import ENHANCED_STYLE_CSS
+from .output_janitor import start_output_janitor
 
 def create_game_asset_interface():
     # 앱 시작 시 저장된 설정 목록을 가져옴
@@ -2158,14 +2163,14 @@ def create_game_asset_interface():
                         "description": sprite_character_description,
                         "actions": actions_text,
                     }
-                    preview_path = image_paths[-1] if image_paths else None
-                    if preview_path:
-                        public_url = record_generated_image(
-                            session["user_id"],
-                            "sprite_sheet",
-                            preview_path,
-                            metadata=metadata,
-                        )
+                    if image_paths:
+                        # 모든 스프라이트를 동시에 업로드하고 한 번에 기록 (마지막 이미지가 대표 이미지)
+                        images = [
+                            ("sprite_sheet_frame", path, dict(metadata, frame_index=index))
+                            for index, path in enumerate(image_paths[:-1])
+                        ]
+                        images.append(("sprite_sheet", image_paths[-1], metadata))
+                        public_url = record_generated_images(session["user_id"], images)[-1]
                         session["last_image_url"] = public_url
                         last_image_update = gr.update(value=public_url, visible=True)
                     token_update = gr.update(value=_format_token_text(remaining), visible=True)
@@ -2335,24 +2340,65 @@ def create_game_asset_interface():
                     pass
             
             if not session.get("authenticated"):
-                return [
+                yield [
                     gr.update(value=[], visible=False),
                     "Please sign in to generate animations.",
                     _token_component_update_from_state(session),
                     _last_image_component_update_from_state(session),
                     session,
                 ]
+                return
 
             if session.get("tokens", 0) <= 0:
-                return [
+                yield [
                     gr.update(value=[], visible=False),
                     "You have no tokens remaining.",
                     gr.update(value=_format_token_text(0), visible=True),
                     _last_image_component_update_from_state(session),
                     session,
                 ]
+                return
+
+            # 프레임이 완성될 때마다 갤러리를 갱신 (생성은 별도 스레드에서 실행)
+            finished_frames = queue.Queue()
+            outcome = {}
 
-            image_paths, status = generate_universal_animation(reference_image, action_type)
+            def _run_animation():
+                try:
+                    outcome["value"] = generate_universal_animation(
+                        reference_image,
+                        action_type,
+                        on_frame=lambda index, result: finished_frames.put((index, result)),
+                    )
+                finally:
+                    finished_frames.put(None)
+
+            threading.Thread(target=_run_animation, daemon=True).start()
+
+            reference_path = getattr(reference_image, "name", reference_image)
+            total_frames = animation_frame_count(action_type)
+            frame_paths = {}
+            done_count = 0
+            while True:
+                item = finished_frames.get()
+                if item is None:
+                    break
+                index, result = item
+                done_count += 1
+                if result.get("path"):
+                    frame_paths[index] = result["path"]
+                if reference_path is None:
+                    continue
+                partial_gallery = [reference_path] + [frame_paths[i] for i in sorted(frame_paths)]
+                yield [
+                    gr.update(value=partial_gallery, visible=True),
+                    f"🎨 Generating... {done_count}/{total_frames} frames finished",
+                    gr.update(),
+                    gr.update(),
+                    session,
+                ]
+
+            image_paths, status = outcome.get("value", ([], "❌ Animation generation failed. Please try again."))
             token_update = _token_component_update_from_state(session)
             last_image_update = _last_image_component_update_from_state(session)
 
@@ -2360,13 +2406,15 @@ def create_game_asset_interface():
                 try:
                     remaining = consume_user_token(session["user_id"])
                     session["tokens"] = remaining
-                    preview_path = image_paths[-1]
-                    public_url = record_generated_image(
-                        session["user_id"],
-                        f"sprite_animation_{action_type}".lower(),
-                        preview_path,
-                        metadata={"action_type": action_type},
-                    )
+                    image_type = f"sprite_animation_{action_type}".lower()
+                    metadata = {"action_type": action_type}
+                    # 모든 프레임과 합본 시트를 동시에 업로드하고 한 번에 기록 (0번은 사용자 참조 이미지라 제외)
+                    images = [
+                        (f"{image_type}_frame", path, dict(metadata, frame_index=index))
+                        for index, path in enumerate(image_paths[1:-1])
+                    ]
+                    images.append((image_type, image_paths[-1], metadata))
+                    public_url = record_generated_images(session["user_id"], images)[-1]
                     session["last_image_url"] = public_url
                     token_update = gr.update(value=_format_token_text(remaining), visible=True)
                     last_image_update = gr.update(value=public_url, visible=True)
@@ -2377,7 +2425,7 @@ def create_game_asset_interface():
             else:
                 gallery_update = gr.update(value=[], visible=False)
 
-            return [
+            yield [
                 gallery_update,
                 status,
                 token_update,
@@ -2475,6 +2523,7 @@ def create_game_asset_interface():
     return demo
 
 if __name__ == "__main__":
+    start_output_janitor()
     demo = create_game_asset_interface()
     demo.launch(
         share=True, 
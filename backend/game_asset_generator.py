@@ -5,17 +5,28 @@
 import os
 import PIL
 from io import BytesIO
-from google import genai
 from dotenv import load_dotenv
 import pathlib
 import time
 import shutil
 from PIL import Image
+from typing import NamedTuple
+from .gemini_client import create_image_client
+from .output_naming import is_within, new_output_path
+from .reference_images import reference_part
+from .response_cache import get_global_response_cache, make_cache_key
 from .utils import ART_STYLES, MOOD_OPTIONS, COLOR_PALETTES, CHARACTER_STYLES, LINE_STYLES, COMPOSITION_STYLES
 
 # Load environment variables
 load_dotenv()
 
+
+class EncodedImage(NamedTuple):
+    """A generated image encoded in memory, used instead of a local path when disk persistence is off."""
+    file_name: str
+    data: bytes
+
+
 class GameAssetGenerator:
     def __init__(self):
         """Initialize the game asset generator with API clients and configuration."""
@@ -36,7 +47,7 @@ class GameAssetGenerator:
 
         # Initialize Gemini client
         print("🔄 Initializing Gemini clients...")
-        self.image_gen_client = genai.Client(api_key=self.api_key)
+        self.image_gen_client = create_image_client(self.api_key)
         print("✅ Gemini clients initialized successfully")
 
         # Create directories
@@ -56,18 +67,23 @@ class GameAssetGenerator:
     # -------------------------------------------------------
     # Reference image save
     # -------------------------------------------------------
+    def _is_reference_file(self, path):
+        return is_within(path, self.reference_dir)
+
     def save_reference_image(self, uploaded_file):
         if uploaded_file is None:
             return None
 
         try:
-            timestamp = int(time.time())
-            filename = f"reference_{timestamp}.png"
-            reference_path = os.path.join(self.reference_dir, filename)
-
-            if hasattr(uploaded_file, 'name'):
+            source_path = getattr(uploaded_file, 'name', uploaded_file)
+            if isinstance(source_path, str) and self._is_reference_file(source_path):
+                # 이미 references 폴더에 스트리밍 저장된 업로드는 다시 복사하지 않음
+                reference_path = source_path
+            elif hasattr(uploaded_file, 'name'):
+                reference_path = new_output_path(self.reference_dir, "reference")
                 shutil.copy2(uploaded_file.name, reference_path)
             else:
+                reference_path = new_output_path(self.reference_dir, "reference")
                 if isinstance(uploaded_file, str):
                     shutil.copy2(uploaded_file, reference_path)
                 elif hasattr(uploaded_file, 'save'):
@@ -90,8 +106,14 @@ class GameAssetGenerator:
     # -------------------------------------------------------
     # **FIXED** Image Convert + Save
     # -------------------------------------------------------
-    def save_image(self, response, path, target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False):
-        """Save Gemini-generated image with robust type handling."""
+    def save_image(self, response, path, target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False,
+                   buffer=None):
+        """
+        Save Gemini-generated image with robust type handling.
+
+        The image is written to `path` unless it is None, and PNG-encoded into
+        `buffer` (e.g. a BytesIO) when one is given.
+        """
         
         for part in response.parts:
             image = part.as_image()
@@ -156,20 +178,71 @@ class GameAssetGenerator:
             # -------------------------------
             # 4) Save
             # -------------------------------
-            image.save(path)
-            print(f"✅ Image saved: {path}")
+            if buffer is not None:
+                image.save(buffer, format="PNG")
+            if path is not None:
+                image.save(path)
+                print(f"✅ Image saved: {path}")
             return image
 
         return None
 
+    # -------------------------------------------------------
+    # Generate + Save (with optional response cache)
+    # -------------------------------------------------------
+    def _generate_and_save(self, prompt, content, out_path, reference_paths=None, target_width=None, target_height=None,
+                           lock_aspect_ratio=False, use_percentage=False, use_cache=True, persist=True):
+        """
+        Call Gemini, or reuse a cached result for an identical request.
+
+        Returns `(asset, image)`: `asset` is `out_path` after saving to disk, or an
+        EncodedImage holding the PNG bytes when `persist` is False.
+        """
+        resize_params = (target_width, target_height, lock_aspect_ratio, use_percentage)
+        file_name = os.path.basename(out_path)
+        cache = get_global_response_cache() if use_cache else None
+        cache_key = None
+
+        if cache is not None:
+            cache_key = make_cache_key(self.image_gen_model_name, prompt, reference_paths, resize_params)
+            cached_path = cache.get(cache_key)
+            if cached_path:
+                print(f"♻️ Cache hit — reused generated image: {file_name}")
+                if persist:
+                    shutil.copyfile(cached_path, out_path)
+                    return out_path, Image.open(out_path)
+                with open(cached_path, "rb") as cached_file:
+                    data = cached_file.read()
+                return EncodedImage(file_name, data), Image.open(BytesIO(data))
+
+        response = self.image_gen_client.models.generate_content(
+            model=self.image_gen_model_name,
+            contents=content
+        )
+        buffer = None if persist else BytesIO()
+        img = self.save_image(response, out_path if persist else None, *resize_params, buffer=buffer)
+        asset = out_path if persist else EncodedImage(file_name, buffer.getvalue())
+
+        if cache_key and img is not None:
+            try:
+                if persist:
+                    cache.put(cache_key, out_path)
+                else:
+                    cache.put(cache_key, data=asset.data)
+            except Exception as e:
+                print(f"⚠️ Failed to cache generated image: {e}")
+        return asset, img
+
     # -------------------------------------------------------
     # Character Generation
     # -------------------------------------------------------
     def generate_character_image(self, character_description, style_preferences=None, reference_image_paths=None,
-                                 target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False):
+                                 target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False,
+                                 use_cache=True, persist=True):
 
         prompt = self._build_character_prompt(character_description, style_preferences)
         content = [prompt]
+        used_reference_paths = []
 
         # Handle multiple reference images
         if reference_image_paths:
@@ -179,42 +252,43 @@ class GameAssetGenerator:
             
             for ref_path in reference_image_paths:
                 if ref_path and os.path.exists(ref_path):
-                    content.append(PIL.Image.open(ref_path))
+                    content.append(reference_part(ref_path, self.image_gen_client))
+                    used_reference_paths.append(ref_path)
                     print(f"Using reference image: {ref_path}")
 
-        response = self.image_gen_client.models.generate_content(
-            model=self.image_gen_model_name,
-            contents=content
-        )
-
-        ts = int(time.time())
-        out_path = os.path.join(self.character_dir, f"character_{ts}.png")
-        img = self.save_image(response, out_path, target_width, target_height, lock_aspect_ratio, use_percentage)
-
-        return out_path, img
+        out_path = new_output_path(self.character_dir, "character", create=persist)
+        return self._generate_and_save(prompt, content, out_path, used_reference_paths,
+                                       target_width, target_height, lock_aspect_ratio, use_percentage,
+                                       use_cache, persist)
 
     # -------------------------------------------------------
     # Character Sprites
     # -------------------------------------------------------
     def generate_character_sprites(self, character_description, actions, style_preferences=None, reference_image_path=None,
-                                   target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False):
+                                   target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False,
+                                   on_frame=None):
 
         results = []
 
-        for action in actions:
+        # 레퍼런스는 한 번만 인코딩해서 모든 액션 요청에 재사용
+        reference = None
+        if reference_image_path and os.path.exists(reference_image_path):
+            reference = reference_part(reference_image_path, self.image_gen_client)
+
+        for index, action in enumerate(actions):
+            started = time.perf_counter()
             prompt = self._build_sprite_prompt(character_description, action, style_preferences)
             content = [prompt]
 
-            if reference_image_path and os.path.exists(reference_image_path):
-                content.append(PIL.Image.open(reference_image_path))
+            if reference is not None:
+                content.append(reference)
 
             response = self.image_gen_client.models.generate_content(
                 model=self.image_gen_model_name,
                 contents=content
             )
 
-            ts = int(time.time())
-            out_path = os.path.join(self.character_dir, f"character_{action}_{ts}.png")
+            out_path = new_output_path(self.character_dir, f"character_{action}")
             img = self.save_image(response, out_path, target_width, target_height, lock_aspect_ratio, use_percentage)
 
             results.append({
@@ -223,6 +297,14 @@ class GameAssetGenerator:
                 "image": img
             })
 
+            if on_frame is not None:
+                on_frame(index, {
+                    "frame_name": action,
+                    "path": out_path if img is not None else None,
+                    "error": None if img is not None else "no image in response",
+                    "elapsed": time.perf_counter() - started,
+                })
+
         return results
 
     # -------------------------------------------------------
@@ -230,44 +312,35 @@ class GameAssetGenerator:
     # -------------------------------------------------------
     def generate_background_image(self, background_description, orientation="landscape",
                                   style_preferences=None, target_width=None, target_height=None,
-                                  lock_aspect_ratio=False, use_percentage=False):
+                                  lock_aspect_ratio=False, use_percentage=False, use_cache=True, persist=True):
 
         prompt = self._build_background_prompt(background_description, orientation, style_preferences)
 
-        response = self.image_gen_client.models.generate_content(
-            model=self.image_gen_model_name,
-            contents=[prompt]
-        )
-
-        ts = int(time.time())
-        out_path = os.path.join(self.background_dir, f"background_{orientation}_{ts}.png")
-        img = self.save_image(response, out_path, target_width, target_height, lock_aspect_ratio, use_percentage)
-
-        return out_path, img
+        out_path = new_output_path(self.background_dir, f"background_{orientation}", create=persist)
+        return self._generate_and_save(prompt, [prompt], out_path, None,
+                                       target_width, target_height, lock_aspect_ratio, use_percentage,
+                                       use_cache, persist)
 
     # -------------------------------------------------------
     # Item Generation
     # -------------------------------------------------------
     def generate_item_image(self, item_description, style_preferences=None, reference_image_path=None,
-                            target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False):
+                            target_width=None, target_height=None, lock_aspect_ratio=False, use_percentage=False,
+                            use_cache=True, persist=True):
 
         prompt = self._build_item_prompt(item_description, style_preferences)
         content = [prompt]
+        used_reference_paths = []
 
         if reference_image_path and os.path.exists(reference_image_path):
-            content.append(PIL.Image.open(reference_image_path))
+            content.append(reference_part(reference_image_path, self.image_gen_client))
+            used_reference_paths.append(reference_image_path)
             print(f"Using reference image: {reference_image_path}")
 
-        response = self.image_gen_client.models.generate_content(
-            model=self.image_gen_model_name,
-            contents=content
-        )
-
-        ts = int(time.time())
-        out_path = os.path.join(self.item_dir, f"item_{ts}.png")
-        img = self.save_image(response, out_path, target_width, target_height, lock_aspect_ratio, use_percentage)
-
-        return out_path, img
+        out_path = new_output_path(self.item_dir, "item", create=persist)
+        return self._generate_and_save(prompt, content, out_path, used_reference_paths,
+                                       target_width, target_height, lock_aspect_ratio, use_percentage,
+                                       use_cache, persist)
 
     # =====================================================
     # Prompt builders (기존 유지)
@@ -0,0 +1,176 @@
+"""
+Gemini 클라이언트 래퍼 - 모든 호출자가 공유하는 프로세스 단위 rate limiter
+
+Every image generator builds its client through `create_image_client`, so
+`models.generate_content` (and the other generation calls, `files.upload`
+and their `client.aio` counterparts) go through one token bucket (requests
+per minute) and one semaphore (in-flight calls) per process, with transient
+errors retried according to `gemini_retry`. Streaming calls cannot be
+throttled per request and are rejected instead of silently bypassing the
+limiter.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from google import genai
+
+from .gemini_retry import call_with_retry, raise_if_blocked
+
+# Load environment variables before reading limiter settings
+load_dotenv()
+
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "10"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", str(GEMINI_MAX_CONCURRENCY)))
+
+
+class TokenBucketRateLimiter:
+    """Token bucket for requests per minute plus a cap on concurrent in-flight calls."""
+
+    def __init__(self, requests_per_minute: float, max_concurrent: int, burst: int = None):
+        # requests_per_minute <= 0 disables the rate limit (concurrency cap still applies)
+        self.rate = requests_per_minute / 60.0 if requests_per_minute > 0 else 0.0
+        self.capacity = float(max(1, burst or max_concurrent))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max(1, max_concurrent))
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self) -> float:
+        """Block until a request token is available. Returns the time spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return time.monotonic() - started
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot and one rate token for the duration of a call."""
+        with self._in_flight:
+            waited = self.acquire()
+            if waited > 1:
+                print(f"⏳ Gemini rate limiter delayed request by {waited:.1f}s")
+            yield
+
+
+# 리미터를 거치는 호출 (재시도 정책도 함께 적용)
+_LIMITED_MODEL_METHODS = ("generate_content", "generate_images", "edit_image", "upscale_image", "generate_videos")
+_LIMITED_FILE_METHODS = ("upload",)
+# 응답을 스트리밍하는 동안 슬롯을 관리할 수 없으므로 래핑하지 않고 막음
+_BLOCKED_METHODS = ("generate_content_stream",)
+
+
+class _RateLimitedNamespace:
+    """Proxy for `client.models` / `client.files` that routes API calls through the limiter."""
+
+    def __init__(self, target, limiter: TokenBucketRateLimiter, limited_methods, blocked_methods=_BLOCKED_METHODS):
+        self._target = target
+        self._limiter = limiter
+        self.limited_methods = frozenset(limited_methods)
+        self.blocked_methods = frozenset(blocked_methods)
+
+    def _call(self, method, *args, **kwargs):
+        def _attempt():
+            # 재시도마다 새 슬롯을 받음 (백오프 대기 중에는 슬롯을 점유하지 않음)
+            with self._limiter.slot():
+                response = method(*args, **kwargs)
+            return raise_if_blocked(response)
+
+        return call_with_retry(_attempt)
+
+    def __getattr__(self, name):
+        if name in self.blocked_methods:
+            raise AttributeError(f"{name} is not rate-limited; use the non-streaming call instead")
+        attr = getattr(self._target, name)
+        if name in self.limited_methods:
+            return functools.partial(self._call, attr)
+        return attr
+
+
+class _AsyncRateLimitedNamespace:
+    """Async counterpart of `_RateLimitedNamespace` for `client.aio.*`."""
+
+    def __init__(self, target, limited: _RateLimitedNamespace):
+        self._target = target
+        self._limited = limited
+
+    def __getattr__(self, name):
+        if name in self._limited.blocked_methods:
+            raise AttributeError(f"aio.{name} is not rate-limited; use the non-streaming call instead")
+        if name in self._limited.limited_methods:
+            sync_method = getattr(self._limited, name)
+
+            async def _call(*args, **kwargs):
+                # 리미터와 재시도는 스레드 기반이므로 이벤트 루프를 막지 않도록 워커 스레드에서 실행
+                return await asyncio.to_thread(sync_method, *args, **kwargs)
+
+            return _call
+        return getattr(self._target, name)
+
+
+class _AsyncRateLimitedClient:
+    """Proxy for `client.aio` whose models/files calls share the process limiter."""
+
+    def __init__(self, aio_client, namespaces):
+        self._aio = aio_client
+        self._namespaces = namespaces
+
+    def __getattr__(self, name):
+        if name in self._namespaces:
+            return _AsyncRateLimitedNamespace(getattr(self._aio, name), self._namespaces[name])
+        return getattr(self._aio, name)
+
+
+class RateLimitedClient:
+    """Drop-in wrapper for `genai.Client` whose models/files calls (sync and aio) share the process limiter and retry policy."""
+
+    def __init__(self, client, limiter: TokenBucketRateLimiter = None):
+        limiter = limiter or get_global_rate_limiter()
+        self._client = client
+        self.models = _RateLimitedNamespace(client.models, limiter, _LIMITED_MODEL_METHODS)
+        self.files = _RateLimitedNamespace(client.files, limiter, _LIMITED_FILE_METHODS)
+
+    @property
+    def aio(self):
+        return _AsyncRateLimitedClient(self._client.aio, {"models": self.models, "files": self.files})
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# Global limiter instance
+_global_rate_limiter = None
+_global_rate_limiter_lock = threading.Lock()
+
+def get_global_rate_limiter():
+    global _global_rate_limiter
+    if _global_rate_limiter is None:
+        with _global_rate_limiter_lock:
+            if _global_rate_limiter is None:
+                _global_rate_limiter = TokenBucketRateLimiter(
+                    GEMINI_REQUESTS_PER_MINUTE, GEMINI_MAX_CONCURRENCY, GEMINI_BURST
+                )
+    return _global_rate_limiter
+
+
+def create_image_client(api_key: str) -> RateLimitedClient:
+    """Create a Gemini client whose generate_content calls share the process-wide limiter."""
+    return RateLimitedClient(genai.Client(api_key=api_key))
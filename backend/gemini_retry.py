@@ -0,0 +1,182 @@
+"""
+Gemini 호출 재시도 정책 - 지수 백오프 + 지터
+
+Transient failures (429 RESOURCE_EXHAUSTED, 5xx, timeouts) are retried with
+full-jitter exponential backoff, honoring server Retry-After / RetryInfo
+hints. Safety blocks and other client errors fail immediately. A per-request
+attempt budget (see `retry_budget`) bounds the total number of retries that
+one multi-call request (e.g. a 6-frame animation) may spend.
+"""
+
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading retry settings
+load_dotenv()
+
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "30"))
+REQUEST_RETRY_BUDGET = int(os.getenv("GEMINI_REQUEST_RETRY_BUDGET", "8"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_STATUS_NAMES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED"}
+SAFETY_FINISH_REASONS = {"SAFETY", "PROHIBITED_CONTENT", "IMAGE_SAFETY", "BLOCKLIST", "SPII"}
+
+
+class SafetyBlockedError(RuntimeError):
+    """Raised when Gemini refuses a request for safety reasons. Never retried."""
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code
+    match = re.match(r"\s*(\d{3})\b", str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_quota_error(error) -> bool:
+    """Return True when an exception is a Gemini quota (429) error."""
+    if _status_code(error) == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(error)
+
+
+def is_retryable_error(error) -> bool:
+    """Classify an exception: True for transient errors worth retrying."""
+    if isinstance(error, SafetyBlockedError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if "Timeout" in type(error).__name__ or "ConnectError" in type(error).__name__:
+        return True
+    status_code = _status_code(error)
+    if status_code is not None:
+        # 상태 코드가 있으면 그것만으로 판단 (메시지에 INTERNAL 등이 들어간 4xx를 재시도하지 않도록)
+        return status_code in RETRYABLE_STATUS_CODES
+    status = getattr(error, "status", None)
+    if status in RETRYABLE_STATUS_NAMES:
+        return True
+    return any(name in str(error) for name in RETRYABLE_STATUS_NAMES)
+
+
+def _parse_delay(value):
+    if value is None:
+        return None
+    match = re.match(r"\s*([\d.]+)\s*s?\s*$", str(value))
+    return float(match.group(1)) if match else None
+
+
+def retry_after_seconds(error):
+    """Extract a server-provided retry delay (Retry-After header or RetryInfo), if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers:
+        try:
+            delay = _parse_delay(headers.get("retry-after") or headers.get("Retry-After"))
+        except Exception:
+            delay = None
+        if delay is not None:
+            return delay
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details or []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return _parse_delay(detail["retryDelay"])
+
+    match = re.search(r"retry(?:Delay| in)[\"':\s]*([\d.]+)\s*s", str(error))
+    return float(match.group(1)) if match else None
+
+
+def raise_if_blocked(response):
+    """Raise SafetyBlockedError when the response was blocked by safety filters."""
+    feedback = getattr(response, "prompt_feedback", None)
+    block_reason = getattr(feedback, "block_reason", None)
+    if block_reason:
+        raise SafetyBlockedError(f"Request blocked by safety filters: {getattr(block_reason, 'name', block_reason)}")
+    for candidate in getattr(response, "candidates", None) or []:
+        finish_reason = getattr(candidate, "finish_reason", None)
+        reason_name = getattr(finish_reason, "name", str(finish_reason or ""))
+        if reason_name in SAFETY_FINISH_REASONS and not getattr(candidate, "content", None):
+            raise SafetyBlockedError(f"Response blocked by safety filters: {reason_name}")
+    return response
+
+
+class RetryBudget:
+    """Thread-safe pool of retries shared by every Gemini call in one user request."""
+
+    def __init__(self, max_retries: int):
+        self.remaining = max_retries
+        self._lock = threading.Lock()
+
+    def consume(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+_current_budget = contextvars.ContextVar("gemini_retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(max_retries: int = None):
+    """
+    Share one retry budget between all Gemini calls made inside the block.
+
+    Worker threads only see the budget when they run in a copy of the caller's
+    context (`contextvars.copy_context().run`).
+    """
+    token = _current_budget.set(RetryBudget(REQUEST_RETRY_BUDGET if max_retries is None else max_retries))
+    try:
+        yield
+    finally:
+        _current_budget.reset(token)
+
+
+def _backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def call_with_retry(func, *args, max_retries: int = None, **kwargs):
+    """Call `func`, retrying transient Gemini errors with exponential backoff and jitter."""
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except Exception as error:
+            if not is_retryable_error(error) or attempt >= max_retries:
+                raise
+
+            server_delay = retry_after_seconds(error)
+            if server_delay is not None:
+                if server_delay > RETRY_MAX_DELAY:
+                    # 서버가 요구한 대기 시간이 너무 길면 요청을 붙잡고 있지 않음 (예산은 소모하지 않음)
+                    raise
+                delay = server_delay + random.uniform(0, RETRY_BASE_DELAY)
+            else:
+                delay = _backoff_delay(attempt)
+
+            # 실제로 재시도할 때만 공유 예산을 차감
+            budget = _current_budget.get()
+            if budget is not None and not budget.consume():
+                print("⚠️ Gemini retry budget for this request is exhausted")
+                raise
+
+            attempt += 1
+            print(f"🔁 Gemini call failed ({error}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
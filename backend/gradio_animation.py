@@ -1,11 +1,47 @@
 """애니메이션 함수들"""
 
 import os
-import time
-import zipfile
-from PIL import Image
 from .pixel_character_generator import generate_pixel_character_interface
 from .game_asset_generator import get_global_generator
+from .frame_scheduler import generate_frames_concurrently
+from .reference_images import reference_part
+from .sprite_compositor import save_sprite_sheet
+from .zip_stream import write_zip
+from .output_naming import new_output_path
+
+def sprite_animation_zip_entries(image_paths):
+    """
+    Map an animation result to `(arcname, path)` ZIP entries.
+
+    The first image is the original, the last the combined sheet; missing
+    files (e.g. an API upload that was already cleaned up) are skipped.
+    """
+    valid_paths = []
+    for img_path in image_paths or []:
+        if not img_path:
+            continue
+        # Handle both string paths and Gradio file objects
+        if isinstance(img_path, str):
+            path = img_path
+        elif hasattr(img_path, 'name'):
+            path = img_path.name
+        else:
+            path = str(img_path)
+        valid_paths.append(path)
+
+    entries = []
+    for i, path in enumerate(valid_paths):
+        if not os.path.exists(path):
+            continue
+        # Add frame number prefix for better organization
+        if i == 0:
+            frame_name = "00_original.png"
+        elif i == len(valid_paths) - 1 and "_combined_" in os.path.basename(path):
+            frame_name = f"{i:02d}_combined_sheet.png"
+        else:
+            frame_name = f"{i:02d}_frame_{i}.png"
+        entries.append((frame_name, path))
+    return entries
 
 def create_sprite_animation_zip(image_paths, action_type):
     """Create a ZIP file containing all generated sprite animation images"""
@@ -13,49 +49,19 @@ def create_sprite_animation_zip(image_paths, action_type):
         return None, "❌ No images to download. Please generate sprites first."
     
     try:
-        # Filter out None values and check if paths exist
-        valid_paths = []
-        for img_path in image_paths:
-            if img_path:
-                # Handle both string paths and Gradio file objects
-                if isinstance(img_path, str):
-                    path = img_path
-                elif hasattr(img_path, 'name'):
-                    path = img_path.name
-                else:
-                    path = str(img_path)
-                
-                if os.path.exists(path):
-                    valid_paths.append(path)
-        
-        if len(valid_paths) == 0:
+        entries = sprite_animation_zip_entries(image_paths)
+        if len(entries) == 0:
             return None, "❌ No valid images found. Please generate sprites first."
         
-        # Create a temporary directory for the ZIP file
+        # Gradio는 파일 경로로만 다운로드를 제공하므로 temp에 기록 (API는 /jobs/{id}/download로 스트리밍)
         temp_dir = os.path.join(os.getenv("OUTPUT_DIR", "data/output"), "temp")
-        os.makedirs(temp_dir, exist_ok=True)
+        zip_path = new_output_path(temp_dir, f"{action_type}_sprites", ".zip")
         
-        # Create ZIP file name with timestamp
-        timestamp = int(time.time())
-        zip_filename = f"{action_type}_sprites_{timestamp}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
+        # PNG는 이미 압축되어 있으므로 ZIP_STORED로 저장
+        write_zip(entries, zip_path)
         
-        # Create ZIP file and add all images
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for i, img_path in enumerate(valid_paths):
-                # Add frame number prefix for better organization
-                if i == 0:
-                    frame_name = "00_original.png"
-                elif i == len(valid_paths) - 1:
-                    frame_name = f"{i:02d}_combined_sheet.png"
-                else:
-                    frame_name = f"{i:02d}_frame_{i}.png"
-                
-                # Add file to ZIP with organized name
-                zipf.write(img_path, frame_name)
-        
-        print(f"✅ ZIP file created: {zip_path} ({len(valid_paths)} images)")
-        return zip_path, f"✅ ZIP file created successfully! ({len(valid_paths)} images)"
+        print(f"✅ ZIP file created: {zip_path} ({len(entries)} images)")
+        return zip_path, f"✅ ZIP file created successfully! ({len(entries)} images)"
         
     except Exception as e:
         import traceback
@@ -82,7 +88,7 @@ def generate_pixel_character(description, character_reference_image=None, item_r
         print(traceback.format_exc())
         return f"❌ Error during generation: {error_msg}\nPlease try again.", None
 
-def generate_sprite_animation(reference_image, action_type):
+def generate_sprite_animation(reference_image, action_type, on_frame=None):
     """Generate sprite animation using Gemini - 6 frames (attack, jump, or walk)"""
     # Input validation
     if reference_image is None:
@@ -101,9 +107,6 @@ def generate_sprite_animation(reference_image, action_type):
         print(f"🔍 Generating 6-frame {action_type} animation with Gemini...")
         print(f"Image path: {image_path}")
         
-        # Load the reference image
-        reference_img = Image.open(image_path)
-        
         # Define frame prompts based on action type
         if action_type == "attack":
             frame_prompts = {
@@ -364,6 +367,9 @@ character facing RIGHT, RUN finishing pose: front foot about to land, rear leg t
         # Get the global generator to use Gemini client
         generator = get_global_generator()
         
+        # Encode the reference once and reuse the same Part for every frame request
+        reference_img = reference_part(image_path, generator.image_gen_client)
+        
         # Generate all 6 frames
         generated_images = []
         output_dir = os.path.join(os.getenv("OUTPUT_DIR", "data/output"), "characters")
@@ -373,93 +379,24 @@ character facing RIGHT, RUN finishing pose: front foot about to land, rear leg t
         generated_images.append(image_path)
         print(f"✅ Original character added as first frame: {image_path}")
         
-        for frame_name, prompt in frame_prompts.items():
-            print(f"🎨 Generating {frame_name}...")
-            
-            try:
-                # Generate image using Gemini
-                content = [prompt, reference_img]
-                response = generator.image_gen_client.models.generate_content(
-                    model=generator.image_gen_model_name,
-                    contents=content
-                )
-                
-                # Save the generated image
-                timestamp = int(time.time())
-                output_path = os.path.join(output_dir, f"{action_type}_{frame_name}_{timestamp}.png")
-                
-                # Save image from Gemini response
-                saved_image = generator.save_image(response, output_path)
-                
-                if saved_image:
-                    generated_images.append(output_path)
-                    print(f"✅ {frame_name} saved: {output_path}")
-                else:
-                    print(f"⚠️ Failed to save {frame_name}")
-                
-                # Longer delay between requests to avoid rate limiting
-                time.sleep(3)
-                
-            except Exception as frame_error:
-                error_msg = str(frame_error)
-                if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                    print(f"⚠️ {frame_name} failed due to quota limit")
-                    return [], "❌ Gemini API 할당량이 소진되었습니다. 잠시 후 다시 시도해주세요. (429 RESOURCE_EXHAUSTED)"
-                else:
-                    print(f"⚠️ {frame_name} failed: {error_msg}")
-                    # Continue with other frames even if one fails
+        # Generate frames concurrently (order is preserved in the results)
+        frame_results = generate_frames_concurrently(
+            generator, frame_prompts, reference_img, output_dir, action_type, on_frame=on_frame
+        )
+        generated_images.extend(result["path"] for result in frame_results if result["path"])
+        quota_exceeded = any(result["quota_exceeded"] for result in frame_results)
+        if quota_exceeded and len(generated_images) == 1:
+            return [], "❌ Gemini API 할당량이 소진되었습니다. 잠시 후 다시 시도해주세요. (429 RESOURCE_EXHAUSTED)"
         
         if len(generated_images) == 7:  # Original + 6 generated frames
-            # Create combined sprite sheet using numpy.hstack
+            # Compose all frames into one RGBA sprite sheet
             print("🎨 Creating combined sprite sheet...")
             try:
-                # Load all images and convert to RGB if needed
-                images = []
-                for i, img_path in enumerate(generated_images):
-                    print(f"Loading image {i+1}: {img_path}")
-                    img = Image.open(img_path)
-                    # Convert to RGB if image has transparency (RGBA)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        # Create white background for transparent images
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                        img = background
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    images.append(img)
-                    print(f"Image {i+1} loaded: {img.size}, mode: {img.mode}")
-                
-                # Resize all images to the same height (use the first image's height)
-                base_height = images[0].height
-                print(f"Base height: {base_height}")
-                resized_images = []
-                for i, img in enumerate(images):
-                    # Calculate new width maintaining aspect ratio
-                    aspect_ratio = img.width / img.height
-                    new_width = int(base_height * aspect_ratio)
-                    resized_img = img.resize((new_width, base_height), Image.Resampling.LANCZOS)
-                    resized_images.append(resized_img)
-                    print(f"Resized image {i+1}: {resized_img.size}")
-                
-                # Convert to numpy arrays and stack horizontally
-                numpy_images = [np.array(img) for img in resized_images]
-                print(f"Converting to numpy arrays, shapes: {[arr.shape for arr in numpy_images]}")
-                combined_array = np.hstack(numpy_images)
-                print(f"Combined array shape: {combined_array.shape}")
-                
-                # Convert back to PIL Image
-                combined_image = Image.fromarray(combined_array)
-                
-                # Save combined image
-                timestamp = int(time.time())
-                combined_path = os.path.join(output_dir, f"{action_type}_combined_{timestamp}.png")
-                combined_image.save(combined_path, 'PNG')
+                combined_path = new_output_path(output_dir, f"{action_type}_combined")
+                save_sprite_sheet(generated_images, combined_path)
                 
                 # Add combined image to the list
                 generated_images.append(combined_path)
-                print(f"✅ Combined sprite sheet saved: {combined_path}")
                 
                 action_emoji = "⚔️" if action_type == "attack" else "🦘"
                 return generated_images, f"✅ Successfully generated 8 frames (Original + 6 {action_type} frames + Combined sprite sheet) with Gemini! 🎮{action_emoji}"
@@ -473,7 +410,8 @@ character facing RIGHT, RUN finishing pose: front foot about to land, rear leg t
                 
         elif len(generated_images) > 1:  # At least original + some generated frames
             generated_count = len(generated_images) - 1  # Subtract original
-            return generated_images, f"⚠️ Generated {generated_count}/6 {action_type} frames. Some frames failed."
+            quota_note = " (Gemini API quota exhausted, please retry later)" if quota_exceeded else ""
+            return generated_images, f"⚠️ Generated {generated_count}/6 {action_type} frames. Some frames failed.{quota_note}"
         else:
             return [], "❌ Failed to generate any frames."
         
@@ -484,7 +422,7 @@ character facing RIGHT, RUN finishing pose: front foot about to land, rear leg t
         print(traceback.format_exc())
         return [], f"❌ Error during generation: {error_msg}\nPlease try again."
 
-def generate_dead_animation(reference_image):
+def generate_dead_animation(reference_image, on_frame=None):
     """Generate dead animation using Gemini - 5 frames"""
     # Input validation
     if reference_image is None:
@@ -500,9 +438,6 @@ def generate_dead_animation(reference_image):
         print("🔍 Generating 5-frame dead animation with Gemini...")
         print(f"Image path: {image_path}")
         
-        # Load the reference image
-        reference_img = Image.open(image_path)
-        
         # Define 5 frame prompts for dead animation
         frame_prompts_dead = {
             "frame1_hit_recoil": """Create the character according to the description below.
@@ -581,6 +516,9 @@ Weapon, pivot alignment, and overall proportions must remain consistent with pre
         # Get the global generator to use Gemini client
         generator = get_global_generator()
         
+        # Encode the reference once and reuse the same Part for every frame request
+        reference_img = reference_part(image_path, generator.image_gen_client)
+        
         # Generate all 5 frames
         generated_images = []
         output_dir = os.path.join(os.getenv("OUTPUT_DIR", "data/output"), "characters")
@@ -590,93 +528,24 @@ Weapon, pivot alignment, and overall proportions must remain consistent with pre
         generated_images.append(image_path)
         print(f"✅ Original character added as first frame: {image_path}")
         
-        for frame_name, prompt in frame_prompts_dead.items():
-            print(f"🎨 Generating {frame_name}...")
-            
-            try:
-                # Generate image using Gemini
-                content = [prompt, reference_img]
-                response = generator.image_gen_client.models.generate_content(
-                    model=generator.image_gen_model_name,
-                    contents=content
-                )
-                
-                # Save the generated image
-                timestamp = int(time.time())
-                output_path = os.path.join(output_dir, f"dead_{frame_name}_{timestamp}.png")
-                
-                # Save image from Gemini response
-                saved_image = generator.save_image(response, output_path)
-                
-                if saved_image:
-                    generated_images.append(output_path)
-                    print(f"✅ {frame_name} saved: {output_path}")
-                else:
-                    print(f"⚠️ Failed to save {frame_name}")
-                
-                # Longer delay between requests to avoid rate limiting
-                time.sleep(3)
-                
-            except Exception as frame_error:
-                error_msg = str(frame_error)
-                if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                    print(f"⚠️ {frame_name} failed due to quota limit")
-                    return [], "❌ Gemini API 할당량이 소진되었습니다. 잠시 후 다시 시도해주세요. (429 RESOURCE_EXHAUSTED)"
-                else:
-                    print(f"⚠️ {frame_name} failed: {error_msg}")
-                    # Continue with other frames even if one fails
+        # Generate frames concurrently (order is preserved in the results)
+        frame_results = generate_frames_concurrently(
+            generator, frame_prompts_dead, reference_img, output_dir, "dead", on_frame=on_frame
+        )
+        generated_images.extend(result["path"] for result in frame_results if result["path"])
+        quota_exceeded = any(result["quota_exceeded"] for result in frame_results)
+        if quota_exceeded and len(generated_images) == 1:
+            return [], "❌ Gemini API 할당량이 소진되었습니다. 잠시 후 다시 시도해주세요. (429 RESOURCE_EXHAUSTED)"
         
         if len(generated_images) == 6:  # Original + 5 generated frames
-            # Create combined sprite sheet using numpy.hstack
+            # Compose all frames into one RGBA sprite sheet
             print("🎨 Creating combined sprite sheet...")
             try:
-                # Load all images and convert to RGB if needed
-                images = []
-                for i, img_path in enumerate(generated_images):
-                    print(f"Loading image {i+1}: {img_path}")
-                    img = Image.open(img_path)
-                    # Convert to RGB if image has transparency (RGBA)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        # Create white background for transparent images
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                        img = background
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    images.append(img)
-                    print(f"Image {i+1} loaded: {img.size}, mode: {img.mode}")
-                
-                # Resize all images to the same height (use the first image's height)
-                base_height = images[0].height
-                print(f"Base height: {base_height}")
-                resized_images = []
-                for i, img in enumerate(images):
-                    # Calculate new width maintaining aspect ratio
-                    aspect_ratio = img.width / img.height
-                    new_width = int(base_height * aspect_ratio)
-                    resized_img = img.resize((new_width, base_height), Image.Resampling.LANCZOS)
-                    resized_images.append(resized_img)
-                    print(f"Resized image {i+1}: {resized_img.size}")
-                
-                # Convert to numpy arrays and stack horizontally
-                numpy_images = [np.array(img) for img in resized_images]
-                print(f"Converting to numpy arrays, shapes: {[arr.shape for arr in numpy_images]}")
-                combined_array = np.hstack(numpy_images)
-                print(f"Combined array shape: {combined_array.shape}")
-                
-                # Convert back to PIL Image
-                combined_image = Image.fromarray(combined_array)
-                
-                # Save combined image
-                timestamp = int(time.time())
-                combined_path = os.path.join(output_dir, f"dead_combined_{timestamp}.png")
-                combined_image.save(combined_path, 'PNG')
+                combined_path = new_output_path(output_dir, "dead_combined")
+                save_sprite_sheet(generated_images, combined_path)
                 
                 # Add combined image to the list
                 generated_images.append(combined_path)
-                print(f"✅ Combined sprite sheet saved: {combined_path}")
                 
                 return generated_images, f"✅ Successfully generated 7 frames (Original + 5 dead frames + Combined sprite sheet) with Gemini! 🎮💀"
                 
@@ -688,7 +557,8 @@ Weapon, pivot alignment, and overall proportions must remain consistent with pre
                 
         elif len(generated_images) > 1:  # At least original + some generated frames
             generated_count = len(generated_images) - 1  # Subtract original
-            return generated_images, f"⚠️ Generated {generated_count}/5 dead frames. Some frames failed."
+            quota_note = " (Gemini API quota exhausted, please retry later)" if quota_exceeded else ""
+            return generated_images, f"⚠️ Generated {generated_count}/5 dead frames. Some frames failed.{quota_note}"
         else:
             return [], "❌ Failed to generate any frames."
         
@@ -699,12 +569,17 @@ Weapon, pivot alignment, and overall proportions must remain consistent with pre
         print(traceback.format_exc())
         return [], f"❌ Error during generation: {error_msg}\nPlease try again."
 
-def generate_universal_animation(reference_image, action_type):
+def generate_universal_animation(reference_image, action_type, on_frame=None):
     """Route animation generation based on the selected action type."""
     normalized_type = (action_type or "").strip().lower()
     if normalized_type == "dead":
-        return generate_dead_animation(reference_image)
-    return generate_sprite_animation(reference_image, normalized_type or "attack")
+        return generate_dead_animation(reference_image, on_frame=on_frame)
+    return generate_sprite_animation(reference_image, normalized_type or "attack", on_frame=on_frame)
+
+
+def animation_frame_count(action_type):
+    """Number of Gemini frames generated for an action type."""
+    return 5 if (action_type or "").strip().lower() == "dead" else 6
 
 def update_animation_info(action_type):
     """Update animation info based on selected action type"""
@@ -6,8 +6,8 @@ from .gradio_helpers import build_user_preferences
 def generate_character_interface(character_description, art_style, mood, color_palette, 
                                character_style, line_style, composition, additional_notes, 
                                character_reference_image=None, item_reference_image=None, image_width=None, image_height=None, 
-                               lock_aspect_ratio=False, use_percentage=False):
-    """Interface function for character generation."""
+                               lock_aspect_ratio=False, use_percentage=False, bypass_cache=False, persist=True):
+    """Interface function for character generation. Returns an EncodedImage instead of a path when `persist` is False."""
     generator = get_global_generator()
     try:
         # Build user preferences dictionary
@@ -28,7 +28,8 @@ def generate_character_interface(character_description, art_style, mood, color_p
         # Generate character image with multiple references
         image_path, saved_image = generator.generate_character_image(
             character_description, user_preferences, reference_paths,
-            image_width, image_height, lock_aspect_ratio, use_percentage
+            image_width, image_height, lock_aspect_ratio, use_percentage,
+            use_cache=not bypass_cache, persist=persist
         )
         
         return image_path, "✅ Character generated successfully!"
@@ -40,7 +41,8 @@ def generate_character_interface(character_description, art_style, mood, color_p
 def generate_character_sprites_interface(character_description, actions_text, art_style, mood, 
                                        color_palette, character_style, line_style, composition, 
                                        additional_notes, reference_image, image_width=None, 
-                                       image_height=None, lock_aspect_ratio=False, use_percentage=False):
+                                       image_height=None, lock_aspect_ratio=False, use_percentage=False,
+                                       on_frame=None):
     """Interface function for character sprite generation."""
     generator = get_global_generator()
     try:
@@ -60,7 +62,8 @@ def generate_character_sprites_interface(character_description, actions_text, ar
         # Generate character sprites
         generated_sprites = generator.generate_character_sprites(
             character_description, actions, user_preferences, reference_path,
-            image_width, image_height, lock_aspect_ratio, use_percentage
+            image_width, image_height, lock_aspect_ratio, use_percentage,
+            on_frame=on_frame
         )
         
         # Return image paths for gallery display
@@ -75,8 +78,8 @@ def generate_character_sprites_interface(character_description, actions_text, ar
 def generate_background_interface(background_description, orientation, art_style, mood, 
                                 color_palette, line_style, composition, additional_notes,
                                 image_width=None, image_height=None, lock_aspect_ratio=False, 
-                                use_percentage=False):
-    """Interface function for background generation."""
+                                use_percentage=False, bypass_cache=False, persist=True):
+    """Interface function for background generation. Returns an EncodedImage instead of a path when `persist` is False."""
     generator = get_global_generator()
     try:
         # Build user preferences dictionary
@@ -85,7 +88,8 @@ def generate_background_interface(background_description, orientation, art_style
         # Generate background image
         image_path, saved_image = generator.generate_background_image(
             background_description, orientation, user_preferences,
-            image_width, image_height, lock_aspect_ratio, use_percentage
+            image_width, image_height, lock_aspect_ratio, use_percentage,
+            use_cache=not bypass_cache, persist=persist
         )
         
         return image_path, f"✅ Background generated successfully! ({orientation})"
@@ -97,8 +101,8 @@ def generate_background_interface(background_description, orientation, art_style
 def generate_item_interface(item_description, art_style, mood, color_palette, 
                           line_style, composition, additional_notes, reference_image,
                           image_width=None, image_height=None, lock_aspect_ratio=False, 
-                          use_percentage=False):
-    """Interface function for item generation."""
+                          use_percentage=False, bypass_cache=False, persist=True):
+    """Interface function for item generation. Returns an EncodedImage instead of a path when `persist` is False."""
     generator = get_global_generator()
     try:
         # Build user preferences dictionary
@@ -112,7 +116,8 @@ def generate_item_interface(item_description, art_style, mood, color_palette,
         # Generate item image
         image_path, saved_image = generator.generate_item_image(
             item_description, user_preferences, reference_path,
-            image_width, image_height, lock_aspect_ratio, use_percentage
+            image_width, image_height, lock_aspect_ratio, use_percentage,
+            use_cache=not bypass_cache, persist=persist
         )
         
         return image_path, "✅ Item generated successfully!"
@@ -0,0 +1,239 @@
+"""
+생성 이미지 메타데이터 지연 기록 - generated_images INSERT를 모아서 한 번에 처리
+
+Rows are appended to a local JSONL spool before they are acknowledged, so
+they survive a crash or restart. A background flusher inserts them in
+batches (every `batch_size` rows or `flush_interval` seconds) and retries
+failed batches with exponential backoff. A batch that still fails after
+RECORD_MAX_ATTEMPTS tries is moved to a `.dead.jsonl` file so one bad row
+cannot block later inserts. Each row carries a client-side UUID and is
+written with an idempotent upsert, so replaying a spool never creates
+duplicates.
+
+Every process writes its own spool (`<name>.<pid>-<id>.jsonl`) guarded by a
+`.lock` file it keeps locked while alive. At startup a process claims the
+spools whose lock is free (their process exited or crashed), so several
+workers, or the API next to Gradio, never overwrite each other's rows.
+"""
+
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: 다른 프로세스의 spool은 회수하지 않음
+    fcntl = None
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading recorder settings
+load_dotenv()
+
+RECORD_DEFERRED = os.getenv("SUPABASE_RECORD_DEFERRED", "true").lower() in ("1", "true", "yes")
+RECORD_BATCH_SIZE = int(os.getenv("SUPABASE_RECORD_BATCH_SIZE", "50"))
+RECORD_FLUSH_MS = int(os.getenv("SUPABASE_RECORD_FLUSH_MS", "500"))
+RECORD_SPOOL_PATH = os.getenv("SUPABASE_RECORD_SPOOL_PATH", "data/spool/generated_images.jsonl")
+RECORD_RETRY_MAX_SECONDS = float(os.getenv("SUPABASE_RECORD_RETRY_MAX_SECONDS", "60"))
+RECORD_MAX_ATTEMPTS = int(os.getenv("SUPABASE_RECORD_MAX_ATTEMPTS", "10"))
+
+
+def _write_rows(path: str, rows: Sequence[Dict[str, Any]], mode: str = "a") -> None:
+    with open(path, mode, encoding="utf-8") as handle:
+        for row in rows:
+            handle.write(json.dumps(row, ensure_ascii=False) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _read_rows(path: str) -> List[Dict[str, Any]]:
+    rows = []
+    try:
+        with open(path, "r", encoding="utf-8") as spool:
+            for line in spool:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 크래시로 잘린 마지막 줄은 버림
+                    print("⚠️ Skipping truncated line in generated image spool")
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+class DeferredRowRecorder:
+    """Durable, batched background writer for rows of a single table."""
+
+    def __init__(self, insert_batch: Callable[[List[Dict[str, Any]]], None], spool_path: str,
+                 batch_size: int = RECORD_BATCH_SIZE, flush_interval: float = RECORD_FLUSH_MS / 1000,
+                 max_attempts: int = RECORD_MAX_ATTEMPTS):
+        self.insert_batch = insert_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_attempts = max(1, max_attempts)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._head_failures = 0
+
+        os.makedirs(os.path.dirname(spool_path) or ".", exist_ok=True)
+        self._spool_base = os.path.splitext(spool_path)[0]
+        self.dead_letter_path = f"{self._spool_base}.dead.jsonl"
+        owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.spool_path = f"{self._spool_base}.{owner}.jsonl"
+        self._lock_path = f"{self._spool_base}.{owner}.lock"
+        if fcntl is not None:
+            # 잠근 뒤에 최종 이름으로 바꿔야 다른 프로세스가 잠기기 전의 파일을 회수하지 않음
+            self._lock_handle = open(self._lock_path + ".tmp", "a")
+            fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(self._lock_path + ".tmp", self._lock_path)
+        else:
+            # Windows는 열린 파일을 rename/삭제할 수 없고 잠금으로 회수하지도 않으므로 바로 생성
+            self._lock_handle = open(self._lock_path, "a")
+
+        self._pending.extend(self._claim_orphaned_spools(spool_path))
+        if self._pending:
+            print(f"📦 Replaying {len(self._pending)} spooled generated image row(s)")
+
+        self._thread = threading.Thread(target=self._run, name="image-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _claim_orphaned_spools(self, legacy_path: str) -> List[Dict[str, Any]]:
+        """Take over the spools of processes that are gone and return their rows."""
+        rows = []
+        claimed = []
+        # 이전 버전의 공용 spool은 자기 spool로 rename해서 한 프로세스만 가져감
+        try:
+            os.replace(legacy_path, self.spool_path)
+            rows.extend(_read_rows(self.spool_path))
+        except FileNotFoundError:
+            pass
+
+        if fcntl is not None:
+            for lock_path in glob.glob(f"{glob.escape(self._spool_base)}.*.lock"):
+                if lock_path == self._lock_path:
+                    continue
+                try:
+                    handle = open(lock_path, "a")
+                except OSError:
+                    continue
+                try:
+                    # 잠금을 얻었다면 주인 프로세스는 이미 종료됨
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    continue
+                orphan_spool = lock_path[:-len(".lock")] + ".jsonl"
+                orphan_rows = _read_rows(orphan_spool)
+                rows.extend(orphan_rows)
+                claimed.append((orphan_spool, lock_path, handle, orphan_rows))
+
+        # 회수한 행을 자기 spool에 fsync한 뒤에만 원본을 지움 (중간에 죽어도 upsert라 중복 없음)
+        orphan_rows = [row for *_paths, claimed_rows in claimed for row in claimed_rows]
+        if orphan_rows:
+            _write_rows(self.spool_path, orphan_rows)
+        for orphan_spool, lock_path, handle, _claimed_rows in claimed:
+            for path in (orphan_spool, lock_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            handle.close()
+        return rows
+
+    def _rewrite_spool(self) -> None:
+        """Replace the spool with the rows that are still pending. Caller holds the lock."""
+        directory = os.path.dirname(self.spool_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_handle:
+            for row in self._pending:
+                tmp_handle.write(json.dumps(row, ensure_ascii=False) + "\n")
+            tmp_handle.flush()
+            os.fsync(tmp_handle.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def enqueue(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Durably spool `rows` and schedule them for the next batch insert."""
+        if not rows:
+            return
+        with self._lock:
+            _write_rows(self.spool_path, rows)
+            self._pending.extend(rows)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self) -> bool:
+        """
+        Insert pending rows in batches. Returns False if a batch failed.
+
+        A batch that has failed `max_attempts` times in a row is appended to
+        the dead-letter file and dropped from the spool.
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return True
+                try:
+                    self.insert_batch(batch)
+                    self._head_failures = 0
+                except Exception as exc:
+                    self._head_failures += 1
+                    print(
+                        f"⚠️ Failed to record {len(batch)} generated image row(s) "
+                        f"(attempt {self._head_failures}/{self.max_attempts}): {exc}"
+                    )
+                    if self._head_failures < self.max_attempts:
+                        return False
+                    _write_rows(self.dead_letter_path, batch)
+                    self._head_failures = 0
+                    print(f"❌ Moved {len(batch)} generated image row(s) to {self.dead_letter_path}")
+                with self._lock:
+                    # flush 중에 추가된 행은 뒤에 붙으므로 앞쪽 batch만 제거
+                    del self._pending[:len(batch)]
+                    self._rewrite_spool()
+
+    def _run(self) -> None:
+        retry_delay = 0.0
+        while not self._stopped:
+            self._wakeup.wait(retry_delay or self.flush_interval)
+            self._wakeup.clear()
+            if self.flush():
+                retry_delay = 0.0
+            else:
+                retry_delay = min(RECORD_RETRY_MAX_SECONDS, max(1.0, retry_delay * 2))
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Stop the flusher and make a final best-effort flush.
+
+        Unflushed rows stay spooled and are claimed by the next process.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+        flushed = self.flush()
+        # 열린 파일은 Windows에서 지울 수 없으므로 먼저 닫음 (남은 행이 없을 때만 지우므로 그 사이 회수돼도 무해)
+        self._lock_handle.close()
+        if flushed:
+            with self._lock:
+                if not self._pending:
+                    for path in (self.spool_path, self._lock_path):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
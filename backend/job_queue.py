@@ -0,0 +1,354 @@
+"""
+백그라운드 작업 큐 - 긴 생성 작업을 Job ID로 제출하고 폴링
+
+Jobs run on in-process worker threads; their status, per-frame progress and
+result are persisted in a SQLite database so `GET /jobs/{id}` can be served
+by any request without keeping the submitting HTTP connection open.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from .supabase_client import refund_user_token
+
+# Load environment variables before reading job settings
+load_dotenv()
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+# 여러 프로세스가 같은 DB를 공유하므로 하트비트가 끊긴 프로세스의 작업만 실패 처리
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_OWNER_TIMEOUT_SECONDS = float(os.getenv("JOB_OWNER_TIMEOUT_SECONDS", "60"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+# 작업 결과에서 이 키의 값은 공개 result가 아니라 내부 private 컬럼에 저장됨
+PRIVATE_RESULT_KEY = "_private"
+
+
+class JobStore:
+    """SQLite-backed job records. Each call opens its own connection, so it is thread-safe."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    user_id TEXT,
+                    status TEXT NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    private TEXT,
+                    reserved_tokens INTEGER NOT NULL DEFAULT 0,
+                    refunded INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "private" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN private TEXT")
+            if "reserved_tokens" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN reserved_tokens INTEGER NOT NULL DEFAULT 0")
+            if "refunded" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN refunded INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_owners (
+                    owner TEXT PRIMARY KEY,
+                    heartbeat_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, kind: str, user_id: Optional[str], progress: Dict[str, Any],
+               owner: Optional[str] = None, reserved_tokens: int = 0) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, status, progress, created_at, updated_at, owner, "
+                "reserved_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, STATUS_QUEUED, json.dumps(progress), now, now, owner, reserved_tokens),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        columns = []
+        values = []
+        for key, value in fields.items():
+            if key in ("progress", "result", "private"):
+                value = json.dumps(value, ensure_ascii=False)
+            columns.append(f"{key} = ?")
+            values.append(value)
+        columns.append("updated_at = ?")
+        values.append(time.time())
+        values.append(job_id)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", values)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["private"] = json.loads(job["private"]) if job.get("private") else None
+        return job
+
+    def heartbeat(self, owner: str) -> None:
+        """Record that the process `owner` is alive and still running its jobs."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_owners (owner, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (owner, time.time()),
+            )
+
+    def release(self, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_owners WHERE owner = ?", (owner,))
+
+    def fail_stale(self, reason: str, owner_timeout: float = JOB_OWNER_TIMEOUT_SECONDS) -> int:
+        """
+        Mark queued/running jobs as failed when the process that owns them is gone.
+
+        A process is gone when its heartbeat is older than `owner_timeout`.
+        Jobs of live processes (other workers sharing this database) are left alone.
+        """
+        cutoff = time.time() - owner_timeout
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_owners WHERE heartbeat_at < ?", (cutoff,))
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status IN (?, ?) AND (owner IS NULL OR owner NOT IN (SELECT owner FROM job_owners))",
+                (STATUS_FAILED, reason, time.time(), STATUS_QUEUED, STATUS_RUNNING),
+            )
+            return cursor.rowcount
+
+    def claim_refunds(self, job_id: Optional[str] = None):
+        """
+        Mark failed jobs with reserved tokens as refunded and return `(id, user_id, reserved_tokens)` rows.
+
+        Claiming and marking happen in one write transaction, so each job is
+        returned once even with several processes sharing the database.
+        Limit to one job with `job_id`.
+        """
+        query = "SELECT id, user_id, reserved_tokens FROM jobs WHERE status = ? AND reserved_tokens > 0 AND refunded = 0"
+        params = [STATUS_FAILED]
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = [tuple(row) for row in conn.execute(query, params)]
+            conn.executemany("UPDATE jobs SET refunded = 1 WHERE id = ?", [(row[0],) for row in rows])
+        return rows
+
+    def prune(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE updated_at < ? AND status IN (?, ?)",
+                (cutoff, STATUS_SUCCEEDED, STATUS_FAILED),
+            )
+            return cursor.rowcount
+
+
+class JobQueue:
+    """In-process FIFO of generation jobs executed by a fixed pool of worker threads."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS,
+                 refund: Optional[Callable[[str, int], Any]] = None):
+        self.store = store
+        self._refund = refund
+        self._queue: "queue.Queue" = queue.Queue()
+        self._progress_lock = threading.Lock()
+        self._subscribers: Dict[str, list] = {}
+        self._subscribers_lock = threading.Lock()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        store.heartbeat(self.owner)
+        self._fail_stale_jobs()
+        store.prune(JOB_RETENTION_HOURS * 3600)
+        for index in range(max(1, workers)):
+            threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+    def _fail_stale_jobs(self) -> None:
+        interrupted = self.store.fail_stale("Interrupted: the server process running this job stopped.")
+        if interrupted:
+            print(f"⚠️ Marked {interrupted} job(s) of stopped server processes as failed")
+        # 중단된 작업과 이전에 환불이 실패한 작업의 예약 토큰을 돌려줌
+        self._refund_failed_jobs()
+
+    def _refund_failed_jobs(self, job_id: Optional[str] = None) -> None:
+        if self._refund is None:
+            return
+        for failed_job_id, user_id, amount in self.store.claim_refunds(job_id):
+            try:
+                self._refund(user_id, amount)
+            except Exception as refund_error:
+                # 다음 하트비트에서 다시 시도
+                print(f"⚠️ Failed to refund {amount} token(s) for job {failed_job_id}: {refund_error}")
+                self.store.update(failed_job_id, refunded=0)
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                self.store.heartbeat(self.owner)
+                self._fail_stale_jobs()
+            except Exception as heartbeat_error:
+                print(f"⚠️ Job heartbeat failed: {heartbeat_error}")
+
+    def submit(self, kind: str, func: Callable, user_id: Optional[str] = None,
+               total_frames: Optional[int] = None, reserved_tokens: int = 0) -> str:
+        """
+        Queue `func(on_frame)` and return the new job ID.
+
+        `func` receives an `on_frame(index, frame_result)` callback for
+        per-frame progress and must return a JSON-serializable result dict.
+        A `PRIVATE_RESULT_KEY` entry in that dict is stored separately as
+        `job["private"]` and never exposed through the result or events;
+        finished frame files are kept there too, as `private["frames"][str(index)]`.
+
+        `reserved_tokens` charged for the job at submit are refunded exactly
+        once if it fails, including when its server process dies.
+        """
+        job_id = uuid.uuid4().hex
+        progress = {"total": total_frames, "completed": 0, "frames": []}
+        self.store.create(job_id, kind, user_id, progress, owner=self.owner, reserved_tokens=reserved_tokens)
+        self._queue.put((job_id, func))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def subscribe(self, job_id: str) -> "asyncio.Queue":
+        """
+        Return an asyncio queue that receives `(event, data)` tuples for the job.
+
+        Must be called from a running event loop; worker threads push events
+        into it with `call_soon_threadsafe`. Pair with `unsubscribe`.
+        """
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue" = asyncio.Queue()
+        with self._subscribers_lock:
+            self._subscribers.setdefault(job_id, []).append((loop, events))
+        return events
+
+    def unsubscribe(self, job_id: str, events: "asyncio.Queue") -> None:
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [item for item in subscribers if item[1] is not events]
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, events in subscribers:
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, (event, data))
+            except RuntimeError:
+                # 구독한 이벤트 루프가 이미 종료됨
+                pass
+
+    def _record_frame(self, job_id: str, index: int, frame_result: Dict[str, Any]) -> None:
+        frame = {
+            "index": index,
+            "frame_name": frame_result.get("frame_name"),
+            "finished_at": time.time(),
+            "status": "done" if frame_result.get("path") else "failed",
+            "error": frame_result.get("error"),
+            "elapsed": round(frame_result.get("elapsed") or 0.0, 3),
+        }
+        # 여러 프레임 스레드가 동시에 progress를 갱신하므로 read-modify-write를 직렬화
+        with self._progress_lock:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            progress = job["progress"]
+            progress.setdefault("frames", []).append(frame)
+            progress["completed"] = len(progress["frames"])
+            fields = {"progress": progress}
+            if frame_result.get("path"):
+                # 로컬 경로는 공개 progress가 아니라 private 컬럼에 보관
+                private = job["private"] or {}
+                private.setdefault("frames", {})[str(index)] = frame_result["path"]
+                fields["private"] = private
+            self.store.update(job_id, **fields)
+        self._publish(job_id, "frame", dict(frame, completed=progress["completed"], total=progress.get("total")))
+
+    def _worker(self) -> None:
+        while True:
+            job_id, func = self._queue.get()
+            try:
+                self.store.update(job_id, status=STATUS_RUNNING)
+                result = func(lambda index, frame_result: self._record_frame(job_id, index, frame_result))
+                private = result.pop(PRIVATE_RESULT_KEY, None) if isinstance(result, dict) else None
+                with self._progress_lock:
+                    job = self.store.get(job_id) or {}
+                    # 프레임 경로와 결과의 private 값을 합쳐서 저장
+                    stored_private = dict(job.get("private") or {}, **(private or {}))
+                    self.store.update(job_id, status=STATUS_SUCCEEDED, result=result,
+                                      private=stored_private or None, error=None)
+                self._publish(job_id, STATUS_SUCCEEDED, {"result": result})
+            except Exception as exc:
+                print(f"❌ Job {job_id} failed: {exc}")
+                print(traceback.format_exc())
+                self.store.update(job_id, status=STATUS_FAILED, error=str(exc))
+                self._refund_failed_jobs(job_id)
+                self._publish(job_id, STATUS_FAILED, {"error": str(exc)})
+            finally:
+                self._queue.task_done()
+
+
+# Global job queue instance
+_global_job_queue = None
+_global_job_queue_lock = threading.Lock()
+
+def get_global_job_queue():
+    global _global_job_queue
+    if _global_job_queue is None:
+        with _global_job_queue_lock:
+            if _global_job_queue is None:
+                _global_job_queue = JobQueue(JobStore(JOB_DB_PATH), refund=refund_user_token)
+    return _global_job_queue
@@ -0,0 +1,256 @@
+"""
+출력 폴더 정리 - 하위 폴더별 보관 기간/용량 정책에 따라 오래된 파일 삭제
+
+A daemon thread sweeps the output subdirectories every
+JANITOR_INTERVAL_SECONDS. Each subdirectory has its own policy:
+JANITOR_<NAME>_MAX_AGE_HOURS removes files older than that, and
+JANITOR_<NAME>_MAX_MB removes the oldest remaining files until the
+directory fits its quota (0 disables either limit). Nested directories are
+walked but never removed: `new_output_path` may have just created an empty
+shard directory for a file about to be written, and there are at most
+65,536 shards per directory.
+
+Files still used by in-flight work are never deleted: anything modified
+within JANITOR_GRACE_SECONDS is skipped (frames being written, fresh
+uploads), and callers can pin paths explicitly with `pin`/`unpin` or the
+`in_use` context manager (queued job inputs, streaming downloads).
+Per-directory counters of removed files and reclaimed bytes are available
+via `stats()`, served by the API's `GET /health` and logged per directory
+after each sweep that removed files. The response cache (`cache/`) manages its own size and is
+not touched.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, NamedTuple
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading retention settings
+load_dotenv()
+
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "data/output")
+JANITOR_ENABLED = os.getenv("JANITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "600"))
+JANITOR_GRACE_SECONDS = float(os.getenv("JANITOR_GRACE_SECONDS", "900"))
+
+# 하위 폴더 이름 -> (기본 보관 시간, 기본 용량 MB)
+_DEFAULT_POLICIES = {
+    "temp": (24, 1024),
+    "references": (72, 2048),
+    "characters": (168, 0),
+    "items": (168, 0),
+    "backgrounds": (168, 0),
+}
+
+
+class RetentionPolicy(NamedTuple):
+    """Retention limits for one output subdirectory (0 = no limit)."""
+    max_age_seconds: float
+    max_bytes: int
+
+
+def _load_policies() -> Dict[str, RetentionPolicy]:
+    policies = {}
+    for name, (max_age_hours, max_mb) in _DEFAULT_POLICIES.items():
+        prefix = f"JANITOR_{name.upper()}"
+        max_age_hours = float(os.getenv(f"{prefix}_MAX_AGE_HOURS", str(max_age_hours)))
+        max_mb = float(os.getenv(f"{prefix}_MAX_MB", str(max_mb)))
+        policies[name] = RetentionPolicy(max_age_hours * 3600, int(max_mb * 1024 * 1024))
+    return policies
+
+
+class OutputJanitor:
+    """Background sweeper enforcing per-subdirectory age and size limits."""
+
+    def __init__(self, root: str = OUTPUT_DIR, policies: Dict[str, RetentionPolicy] = None,
+                 interval: float = JANITOR_INTERVAL_SECONDS, grace: float = JANITOR_GRACE_SECONDS):
+        self.root = root
+        self.policies = policies if policies is not None else _load_policies()
+        self.interval = interval
+        self.grace = grace
+        self._pins: Counter = Counter()
+        self._pins_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: {"files_removed": 0, "bytes_reclaimed": 0, "files": 0, "bytes_used": 0}
+            for name in self.policies
+        }
+        self._stats_lock = threading.Lock()
+        self._last_sweep = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # In-use tracking
+    # ------------------------------------------------------------------
+
+    def pin(self, *paths) -> None:
+        """Protect `paths` from deletion until a matching `unpin`."""
+        with self._pins_lock:
+            for path in paths:
+                if path:
+                    self._pins[os.path.abspath(path)] += 1
+
+    def unpin(self, *paths) -> None:
+        with self._pins_lock:
+            for path in paths:
+                if not path:
+                    continue
+                key = os.path.abspath(path)
+                self._pins[key] -= 1
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+
+    @contextmanager
+    def in_use(self, *paths):
+        self.pin(*paths)
+        try:
+            yield
+        finally:
+            self.unpin(*paths)
+
+    def _is_pinned(self, path: str) -> bool:
+        with self._pins_lock:
+            return os.path.abspath(path) in self._pins
+
+    # ------------------------------------------------------------------
+    # Sweeping
+    # ------------------------------------------------------------------
+
+    def _scan(self, directory: str):
+        files = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                files.append((stat.st_mtime, stat.st_size, entry.path))
+                        except FileNotFoundError:
+                            continue
+            except FileNotFoundError:
+                continue
+        return files
+
+    def _remove(self, path: str, now: float, mtime: float) -> bool:
+        if now - mtime < self.grace or self._is_pinned(path):
+            return False
+        try:
+            # 스캔 후 다시 쓰인 파일은 건너뜀
+            if os.stat(path).st_mtime != mtime:
+                return False
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def sweep_directory(self, name: str, policy: RetentionPolicy, now: float):
+        """Apply `policy` to one subdirectory. Returns `(files_removed, bytes_reclaimed)`."""
+        directory = os.path.join(self.root, name)
+        files = self._scan(directory)
+        files.sort()  # 오래된 파일부터
+        total_bytes = sum(size for _mtime, size, _path in files)
+        removed = reclaimed = 0
+        kept = []
+
+        for mtime, size, path in files:
+            expired = policy.max_age_seconds and now - mtime > policy.max_age_seconds
+            over_quota = policy.max_bytes and total_bytes - reclaimed > policy.max_bytes
+            if (expired or over_quota) and self._remove(path, now, mtime):
+                removed += 1
+                reclaimed += size
+            else:
+                kept.append(size)
+
+        with self._stats_lock:
+            stats = self._stats[name]
+            stats["files_removed"] += removed
+            stats["bytes_reclaimed"] += reclaimed
+            stats["files"] = len(kept)
+            stats["bytes_used"] = sum(kept)
+        return removed, reclaimed
+
+    def sweep(self) -> int:
+        """Sweep every configured subdirectory once. Returns the bytes reclaimed."""
+        now = time.time()
+        started = time.monotonic()
+        total_removed = total_reclaimed = 0
+        swept = {}
+        for name, policy in self.policies.items():
+            if not policy.max_age_seconds and not policy.max_bytes:
+                continue
+            removed, reclaimed = self.sweep_directory(name, policy, now)
+            swept[name] = (removed, reclaimed)
+            total_removed += removed
+            total_reclaimed += reclaimed
+        self._last_sweep = now
+        if total_removed:
+            print(
+                f"🧹 Output janitor removed {total_removed} file(s), reclaimed "
+                f"{total_reclaimed / (1024 * 1024):.1f}MB in {time.monotonic() - started:.2f}s"
+            )
+            # 폴더별 이번 삭제량과 남은 사용량
+            stats = self.stats()["directories"]
+            for name, (removed, reclaimed) in swept.items():
+                print(
+                    f"   {name}: -{removed} file(s) / -{reclaimed / (1024 * 1024):.1f}MB, "
+                    f"{stats[name]['files']} file(s) / {stats[name]['bytes_used'] / (1024 * 1024):.1f}MB kept"
+                )
+        return total_reclaimed
+
+    def stats(self) -> Dict[str, object]:
+        """Per-directory usage and cumulative removal counters."""
+        with self._stats_lock:
+            directories = {name: dict(values) for name, values in self._stats.items()}
+        return {
+            "last_sweep": self._last_sweep,
+            "bytes_reclaimed": sum(values["bytes_reclaimed"] for values in directories.values()),
+            "files_removed": sum(values["files_removed"] for values in directories.values()),
+            "directories": directories,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as sweep_error:  # noqa: BLE001
+                print(f"⚠️ Output janitor sweep failed: {sweep_error}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="output-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Global janitor instance
+_global_janitor = None
+_global_janitor_lock = threading.Lock()
+
+def get_global_janitor():
+    global _global_janitor
+    if _global_janitor is None:
+        with _global_janitor_lock:
+            if _global_janitor is None:
+                _global_janitor = OutputJanitor()
+    return _global_janitor
+
+
+def start_output_janitor():
+    """Start the background janitor unless JANITOR_ENABLED is false."""
+    janitor = get_global_janitor()
+    if JANITOR_ENABLED:
+        janitor.start()
+    return janitor
@@ -0,0 +1,94 @@
+"""
+출력 파일 이름 규칙 - ULID 기반의 충돌 없는 이름과 샤딩된 하위 폴더
+
+Every generated file is named `<prefix>_<ulid><ext>`. A ULID is 48 bits of
+millisecond timestamp plus 80 random bits in Crockford base32, so names
+sort by creation time and two requests in the same second (or the same
+millisecond) never collide. Within one millisecond the random part is
+incremented, keeping names monotonic per process.
+
+Files are spread over OUTPUT_SHARD_DEPTH levels of two-hex-digit
+subdirectories (`ab/cd/`) taken from the random bits, so no single
+directory grows past a few thousand entries even with millions of files.
+"""
+
+import os
+import secrets
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading naming settings
+load_dotenv()
+
+# 0 = 샤딩 없이 폴더에 바로 저장
+OUTPUT_SHARD_DEPTH = int(os.getenv("OUTPUT_SHARD_DEPTH", "2"))
+
+_CROCKFORD = "0123456789abcdefghjkmnpqrstvwxyz"
+_RANDOM_BITS = 80
+
+_ulid_lock = threading.Lock()
+_last_millis = -1
+_last_random = 0
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_CROCKFORD[index])
+    return "".join(reversed(chars))
+
+
+def _next_ulid_parts():
+    global _last_millis, _last_random
+    millis = time.time_ns() // 1_000_000
+    with _ulid_lock:
+        if millis <= _last_millis:
+            # 같은 밀리초 안에서는 난수 부분을 1 증가시켜 단조 증가 유지
+            millis = _last_millis
+            _last_random = (_last_random + 1) % (1 << _RANDOM_BITS)
+        else:
+            _last_millis = millis
+            _last_random = secrets.randbits(_RANDOM_BITS)
+        return millis, _last_random
+
+
+def new_ulid() -> str:
+    """Return a new lowercase ULID (26 characters)."""
+    millis, random_part = _next_ulid_parts()
+    return _encode(millis, 10) + _encode(random_part, 16)
+
+
+def shard_dir(directory: str, name: str) -> str:
+    """Return the shard directory for a file named `name` (a ULID-based name) under `directory`."""
+    stem = os.path.splitext(name)[0]
+    ulid = stem.rsplit("_", 1)[-1]
+    # 난수 비트의 하위 16비트를 16진수로 사용 (타임스탬프 자리는 한 폴더에 몰림)
+    random_value = 0
+    for char in ulid[-4:]:
+        random_value = random_value * 32 + max(_CROCKFORD.find(char), 0)
+    shard_hex = f"{random_value & 0xFFFF:04x}"
+    parts = [shard_hex[index * 2:index * 2 + 2] for index in range(min(OUTPUT_SHARD_DEPTH, 2))]
+    return os.path.join(directory, *parts)
+
+
+def new_output_path(directory: str, prefix: str, extension: str = ".png", create: bool = True) -> str:
+    """
+    Return a collision-free path `<directory>/ab/cd/<prefix>_<ulid><extension>`.
+
+    The shard directory is created unless `create` is False.
+    """
+    name = f"{prefix}_{new_ulid()}{extension}"
+    target_dir = shard_dir(directory, name)
+    if create:
+        os.makedirs(target_dir, exist_ok=True)
+    return os.path.join(target_dir, name)
+
+
+def is_within(path: str, directory: str) -> bool:
+    """True if `path` is `directory` or anywhere inside it (including shard subdirectories)."""
+    path = os.path.abspath(path)
+    directory = os.path.abspath(directory)
+    return os.path.commonpath([path, directory]) == directory
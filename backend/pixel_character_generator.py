@@ -4,15 +4,17 @@
 
 import os
 import PIL
-from google import genai
 from dotenv import load_dotenv
-import time
 from PIL import Image
 import json
 from pathlib import Path
 import base64
 import io
 
+from .gemini_client import create_image_client
+from .reference_images import reference_part
+from .output_naming import new_output_path
+
 # Load environment variables
 load_dotenv()
 
@@ -31,26 +33,28 @@ class PixelCharacterGenerator:
         # API key loaded (not logging to prevent leaks)
         
         self.output_dir = os.getenv("OUTPUT_DIR", "data/output")
+        self.character_dir = os.path.join(self.output_dir, "characters")
         self.image_gen_model_name = os.getenv("IMAGE_MODEL_NAME", "gemini-2.5-flash-image-preview")
         
         # Initialize Gemini client
         try:
             print("🔄 Initializing Gemini client...")
-            self.image_gen_client = genai.Client(api_key=self.api_key)
+            self.image_gen_client = create_image_client(self.api_key)
             print("✅ Gemini client initialized successfully")
         except Exception as e:
             print(f"❌ Error initializing Gemini client: {e}")
             raise ValueError(f"Failed to initialize Gemini API client: {e}")
         
-        # Ensure output directory exists
+        # Ensure output directories exist
         os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(self.character_dir, exist_ok=True)
 
-    def save_image(self, response, path):
-        """Save the generated image from response."""
+    def decode_image(self, response):
+        """Decode the first image in the response into a PIL image, without touching disk."""
         for part in response.parts:
-            if image := part.as_image():
-                image.save(path)
-                return image
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data is not None and inline_data.data:
+                return Image.open(io.BytesIO(inline_data.data))
         return None
 
 # Global generator instance
@@ -63,8 +67,14 @@ def get_global_pixel_generator():
         _global_generator = PixelCharacterGenerator()
     return _global_generator
 
-def generate_pixel_character_interface(description: str, character_reference_image=None, item_reference_image=None):
-    """Interface function for pixel character generation - transparent PNG, front view, original quality."""
+def generate_pixel_character_interface(description: str, character_reference_image=None, item_reference_image=None,
+                                       return_bytes: bool = False):
+    """
+    Interface function for pixel character generation - transparent PNG, front view, original quality.
+
+    Returns `(status, output_path)`, or `(status, png_bytes)` without writing
+    anything to disk when `return_bytes` is True.
+    """
     generator = get_global_pixel_generator()
     try:
         if not description or not description.strip():
@@ -95,11 +105,6 @@ def generate_pixel_character_interface(description: str, character_reference_ima
         prompt += "- IMPORTANT: Face/head height = body height (1:1 ratio)\n"
         prompt += "- **UNIFORM STYLE**: Same art style, proportions, and rendering as reference characters\n"
         
-        # Generate timestamp for unique filename
-        timestamp = int(time.time())
-        temp_output_path = os.path.join(generator.output_dir, f"character_temp_{timestamp}.png")
-        output_path = os.path.join(generator.output_dir, f"character_{timestamp}.png")
-        
         # Prepare content list with prompt and reference images
         contents = [prompt]
         
@@ -112,8 +117,7 @@ def generate_pixel_character_interface(description: str, character_reference_ima
                     ref_path = character_reference_image
                 
                 if ref_path and os.path.exists(ref_path):
-                    ref_img = Image.open(ref_path)
-                    contents.append(ref_img)
+                    contents.append(reference_part(ref_path, generator.image_gen_client))
                     print(f"Using character reference image: {ref_path}")
             except Exception as e:
                 print(f"Warning: Could not load character reference image: {e}")
@@ -127,8 +131,7 @@ def generate_pixel_character_interface(description: str, character_reference_ima
                     item_path = item_reference_image
                 
                 if item_path and os.path.exists(item_path):
-                    item_img = Image.open(item_path)
-                    contents.append(item_img)
+                    contents.append(reference_part(item_path, generator.image_gen_client))
                     print(f"Using item reference image: {item_path}")
             except Exception as e:
                 print(f"Warning: Could not load item reference image: {e}")
@@ -147,27 +150,29 @@ def generate_pixel_character_interface(description: str, character_reference_ima
                 contents=contents
             )
             
-            # Save the generated image
-            saved_image = generator.save_image(response, temp_output_path)
+            # Decode the generated image in memory (no temp file round trip)
+            img = generator.decode_image(response)
             
-            if saved_image:
-                # Use original high-quality image without resizing
-                img = Image.open(temp_output_path)
-                
+            if img:
                 # Convert to RGBA if not already (for transparency support)
                 if img.mode != 'RGBA':
                     img = img.convert('RGBA')
                 
-                # Save as high-quality PNG
-                img.save(output_path, 'PNG', optimize=False, quality=100)
+                actual_size = img.size
+                status = f"✅ Pixel art character generated successfully! 🎮 (Size: {actual_size[0]}x{actual_size[1]} PNG)"
                 
-                # Clean up temp file
-                if os.path.exists(temp_output_path) and temp_output_path != output_path:
-                    os.remove(temp_output_path)
+                # Single final PNG encode, to memory or to disk
+                if return_bytes:
+                    buffer = io.BytesIO()
+                    img.save(buffer, 'PNG', optimize=False)
+                    print(f"✅ PIXEL ART character generated successfully in memory ({actual_size[0]}x{actual_size[1]})")
+                    return status, buffer.getvalue()
                 
-                actual_size = img.size
+                # Collision-free, sharded output filename (only created when writing to disk)
+                output_path = new_output_path(generator.character_dir, "character")
+                img.save(output_path, 'PNG', optimize=False)
                 print(f"✅ PIXEL ART character generated successfully: {output_path} ({actual_size[0]}x{actual_size[1]})")
-                return f"✅ Pixel art character generated successfully! 🎮 (Size: {actual_size[0]}x{actual_size[1]} PNG)", output_path
+                return status, output_path
             else:
                 return "❌ Image generation failed. Please try again.", None
                 
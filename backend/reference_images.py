@@ -0,0 +1,178 @@
+"""
+레퍼런스 이미지 전처리 - Gemini로 보내기 전에 크기 제한, EXIF 제거, 효율적인 인코딩
+
+User uploads are often multi-megapixel phone photos. Before one is added to
+a request it is rotated according to its EXIF orientation, stripped of all
+metadata, downscaled so its longest side is at most REFERENCE_MAX_SIDE and
+re-encoded (WebP by default). Results are cached in memory by the SHA-256
+of the original file, so a reference reused by several requests (e.g. every
+frame of an animation) is only decoded and encoded once.
+
+With REFERENCE_TRANSPORT=files the normalized bytes are uploaded once via
+the Gemini Files API and later requests send only the file URI. Without a
+client, or when the upload fails, the inline Part is used instead.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+from google.genai import types
+from PIL import Image, ImageOps, features
+
+# Load environment variables before reading preprocessing settings
+load_dotenv()
+
+REFERENCE_MAX_SIDE = int(os.getenv("REFERENCE_MAX_SIDE", "1024"))
+REFERENCE_FORMAT = os.getenv("REFERENCE_FORMAT", "webp").lower()
+REFERENCE_QUALITY = int(os.getenv("REFERENCE_QUALITY", "90"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "32"))
+REFERENCE_TRANSPORT = os.getenv("REFERENCE_TRANSPORT", "inline").lower()
+# Files API 파일은 48시간 후 만료되므로 여유를 두고 재업로드
+REFERENCE_FILE_TTL_SECONDS = float(os.getenv("REFERENCE_FILE_TTL_HOURS", "47")) * 3600
+
+_MIME_TYPES = {"webp": "image/webp", "png": "image/png", "jpeg": "image/jpeg"}
+
+
+class NormalizedReference(NamedTuple):
+    """A preprocessed reference image, ready to be sent inline."""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+
+    def to_part(self) -> types.Part:
+        return types.Part.from_bytes(data=self.data, mime_type=self.mime_type)
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def _output_format(has_alpha: bool) -> str:
+    output_format = REFERENCE_FORMAT if REFERENCE_FORMAT in _MIME_TYPES else "webp"
+    if output_format == "webp" and not features.check("webp"):
+        output_format = "png"
+    if output_format == "jpeg" and has_alpha:
+        # JPEG은 투명도를 담을 수 없으므로 캐릭터 레퍼런스의 알파 채널을 보존하기 위해 PNG 사용
+        output_format = "png"
+    return output_format
+
+
+def normalize_reference_bytes(raw: bytes) -> NormalizedReference:
+    """Rotate per EXIF, drop metadata, cap the longest side and re-encode an image."""
+    with Image.open(BytesIO(raw)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = _has_alpha(image)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    if max(image.size) > REFERENCE_MAX_SIDE:
+        image.thumbnail((REFERENCE_MAX_SIDE, REFERENCE_MAX_SIDE), Image.Resampling.LANCZOS)
+
+    output_format = _output_format(has_alpha)
+    buffer = BytesIO()
+    if output_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        # EXIF 등 메타데이터는 넘기지 않으므로 저장 결과에서 제거됨
+        image.save(buffer, format=output_format.upper(), quality=REFERENCE_QUALITY)
+    return NormalizedReference(buffer.getvalue(), _MIME_TYPES[output_format], image.width, image.height)
+
+
+class ReferenceImageCache:
+    """Thread-safe LRU of normalized references keyed by the content hash of the original file."""
+
+    def __init__(self, max_entries: int = REFERENCE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, NormalizedReference]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._uploaded: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get_or_normalize(self, path: str) -> NormalizedReference:
+        return self._get_or_normalize(path)[1]
+
+    def _get_or_normalize(self, path: str):
+        with open(path, "rb") as file_handle:
+            raw = file_handle.read()
+        key = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return key, cached
+
+        normalized = normalize_reference_bytes(raw)
+        print(
+            f"🖼️ Normalized reference {os.path.basename(path)}: "
+            f"{len(raw) // 1024}KB -> {len(normalized.data) // 1024}KB "
+            f"({normalized.width}x{normalized.height}, {normalized.mime_type})"
+        )
+        with self._lock:
+            self._entries[key] = normalized
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key, normalized
+
+    def get_part(self, path: str, client=None, transport: str = REFERENCE_TRANSPORT) -> types.Part:
+        """
+        Return a Part for the reference at `path`, encoded once and reusable across requests.
+
+        `transport="files"` uploads the normalized image through `client.files`
+        once per content hash and returns a URI Part; otherwise (or if the
+        upload fails) an inline-data Part is returned.
+        """
+        key, normalized = self._get_or_normalize(path)
+        if transport != "files" or client is None:
+            return normalized.to_part()
+
+        with self._lock:
+            uploaded = self._uploaded.get(key)
+            if uploaded is not None and uploaded[1] > time.monotonic():
+                self._uploaded.move_to_end(key)
+                return uploaded[0]
+
+        try:
+            uploaded_file = client.files.upload(
+                file=BytesIO(normalized.data),
+                config=types.UploadFileConfig(mime_type=normalized.mime_type),
+            )
+            part = types.Part.from_uri(file_uri=uploaded_file.uri, mime_type=normalized.mime_type)
+        except Exception as upload_error:
+            print(f"⚠️ Reference upload to Files API failed, sending inline instead: {upload_error}")
+            return normalized.to_part()
+
+        with self._lock:
+            self._uploaded[key] = (part, time.monotonic() + REFERENCE_FILE_TTL_SECONDS)
+            self._uploaded.move_to_end(key)
+            while len(self._uploaded) > self.max_entries:
+                self._uploaded.popitem(last=False)
+        return part
+
+
+# Global reference cache instance
+_global_reference_cache = None
+_global_reference_cache_lock = threading.Lock()
+
+def get_global_reference_cache():
+    global _global_reference_cache
+    if _global_reference_cache is None:
+        with _global_reference_cache_lock:
+            if _global_reference_cache is None:
+                _global_reference_cache = ReferenceImageCache()
+    return _global_reference_cache
+
+
+def reference_part(path: str, client=None) -> types.Part:
+    """
+    Return the normalized reference image at `path` as a Part for `contents`.
+
+    Build it once per request and pass the same Part to every call that uses
+    the reference. Pass the Gemini `client` to allow Files API uploads.
+    """
+    return get_global_reference_cache().get_part(path, client)
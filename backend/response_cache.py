@@ -0,0 +1,144 @@
+"""
+생성 결과 디스크 캐시 - 동일한 요청은 모델을 다시 호출하지 않음
+
+Entries are content-addressed: the key is a SHA-256 over the model name, the
+final prompt, the bytes of every reference image and the resize parameters.
+The cache is optional (RESPONSE_CACHE_ENABLED) and bounded by total size and
+entry age; the least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading cache settings
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_DIR = os.getenv(
+    "RESPONSE_CACHE_DIR", os.path.join(os.getenv("OUTPUT_DIR", "data/output"), "cache")
+)
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "512"))
+RESPONSE_CACHE_MAX_AGE_HOURS = float(os.getenv("RESPONSE_CACHE_MAX_AGE_HOURS", "24"))
+
+
+def _hash_file(hasher, path, chunk_size=1024 * 1024):
+    with open(path, "rb") as file_handle:
+        for chunk in iter(lambda: file_handle.read(chunk_size), b""):
+            hasher.update(chunk)
+
+
+def make_cache_key(model_name, prompt, reference_paths=None, resize_params=None) -> str:
+    """Build a content-addressed key for a generation request."""
+    hasher = hashlib.sha256()
+    header = {"model": model_name, "prompt": prompt, "resize": list(resize_params or [])}
+    hasher.update(json.dumps(header, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    for ref_path in reference_paths or []:
+        hasher.update(b"\0ref\0")
+        _hash_file(hasher, ref_path)
+    return hasher.hexdigest()
+
+
+class ResponseCache:
+    """Size- and age-bounded on-disk cache of generated PNG files."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_age_seconds: float):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def get(self, key: str):
+        """Return the cached file path for `key`, or None on a miss or an expired entry."""
+        path = self._entry_path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > self.max_age_seconds:
+            self._remove(path)
+            return None
+        # 접근 시간 갱신 (LRU 정렬 기준)
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+
+    def put(self, key: str, source_path: str = None, data: bytes = None) -> None:
+        """Store a copy of `source_path` (or the encoded `data`) under `key` and evict old entries if over budget."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_handle:
+                if data is not None:
+                    tmp_handle.write(data)
+                else:
+                    with open(source_path, "rb") as src_handle:
+                        shutil.copyfileobj(src_handle, tmp_handle)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under `max_bytes`."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for root, _dirs, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith(".png"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if now - stat.st_mtime > self.max_age_seconds:
+                        self._remove(path)
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+
+            removed = 0
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _atime, size, path = entries.pop(0)
+                self._remove(path)
+                total -= size
+                removed += 1
+            return removed
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Global cache instance (None when caching is disabled)
+_global_response_cache = None
+
+def get_global_response_cache():
+    global _global_response_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _global_response_cache is None:
+        _global_response_cache = ResponseCache(
+            RESPONSE_CACHE_DIR,
+            int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+            RESPONSE_CACHE_MAX_AGE_HOURS * 3600,
+        )
+    return _global_response_cache
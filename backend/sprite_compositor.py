@@ -0,0 +1,98 @@
+"""
+스프라이트 시트 합성기 - 프레임들을 하나의 RGBA 시트로 합침
+
+The output array is allocated once and every frame is copied straight into
+its cell, so no intermediate per-frame canvases are created and the alpha
+channel is preserved. Frames are scaled to a common height and laid out on
+a uniform grid (a single row by default), which is what game engines expect
+when slicing a sheet into cells.
+"""
+
+import math
+import os
+from typing import Iterable, NamedTuple, Optional, Union
+
+import numpy as np
+from dotenv import load_dotenv
+from PIL import Image
+
+# Load environment variables before reading layout settings
+load_dotenv()
+
+# 0 = 한 줄로 배치
+SPRITE_SHEET_COLUMNS = int(os.getenv("SPRITE_SHEET_COLUMNS", "0"))
+
+
+class SheetLayout(NamedTuple):
+    """Grid geometry of a composed sprite sheet."""
+    columns: int
+    rows: int
+    cell_width: int
+    cell_height: int
+    frame_count: int
+
+
+def _load_frame(frame: Union[str, Image.Image]) -> Image.Image:
+    if isinstance(frame, Image.Image):
+        return frame if frame.mode == "RGBA" else frame.convert("RGBA")
+    with Image.open(frame) as image:
+        return image.convert("RGBA")
+
+
+def load_frames(frames: Iterable[Union[str, Image.Image]], cell_height: Optional[int] = None):
+    """Load frames as RGBA and scale them to `cell_height` (default: the first frame's height)."""
+    images = [_load_frame(frame) for frame in frames]
+    if not images:
+        raise ValueError("No frames to compose.")
+
+    cell_height = cell_height or images[0].height
+    for index, image in enumerate(images):
+        if image.height != cell_height:
+            new_width = max(1, round(image.width * cell_height / image.height))
+            images[index] = image.resize((new_width, cell_height), Image.Resampling.LANCZOS)
+    return images, cell_height
+
+
+def compose_sprite_sheet(frames: Iterable[Union[str, Image.Image]], columns: Optional[int] = None,
+                         cell_height: Optional[int] = None, padding: int = 0):
+    """
+    Compose frames (paths or PIL images) into one RGBA sprite sheet.
+
+    Frames are resized to `cell_height` (default: the first frame's height)
+    keeping their aspect ratio, then centered in uniform cells on a grid with
+    `columns` columns (default: all frames in one row).
+
+    Returns `(sheet, layout)` where `sheet` is an RGBA PIL image and `layout`
+    a SheetLayout describing the grid.
+    """
+    images, cell_height = load_frames(frames, cell_height)
+
+    columns = columns or SPRITE_SHEET_COLUMNS or len(images)
+    columns = max(1, min(columns, len(images)))
+    rows = math.ceil(len(images) / columns)
+    cell_width = max(image.width for image in images)
+
+    sheet = np.zeros(
+        (rows * cell_height + (rows - 1) * padding, columns * cell_width + (columns - 1) * padding, 4),
+        dtype=np.uint8,
+    )
+    for index, image in enumerate(images):
+        row, column = divmod(index, columns)
+        top = row * (cell_height + padding)
+        left = column * (cell_width + padding) + (cell_width - image.width) // 2
+        sheet[top:top + cell_height, left:left + image.width] = np.asarray(image)
+
+    layout = SheetLayout(columns, rows, cell_width, cell_height, len(images))
+    return Image.fromarray(sheet), layout
+
+
+def save_sprite_sheet(frames, output_path: str, columns: Optional[int] = None) -> SheetLayout:
+    """Compose `frames` and save the sheet as a PNG at `output_path`."""
+    sheet, layout = compose_sprite_sheet(frames, columns=columns)
+    sheet.save(output_path, "PNG")
+    print(
+        f"✅ Sprite sheet saved: {output_path} "
+        f"({layout.frame_count} frames, {layout.columns}x{layout.rows} grid, "
+        f"{layout.cell_width}x{layout.cell_height} cells)"
+    )
+    return layout
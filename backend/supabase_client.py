@@ -10,26 +10,48 @@ Supabase JWT access tokens.
 
 from __future__ import annotations
 
+import base64
+import hashlib
+import json
+import mimetypes
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 import uuid
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from dotenv import load_dotenv
 import jwt
 from supabase import Client, create_client
 
+from .image_recorder import RECORD_DEFERRED, RECORD_SPOOL_PATH, DeferredRowRecorder
+
 DEFAULT_TOKEN_COUNT = int(os.environ.get("SUPABASE_INITIAL_TOKENS", "10"))
 TOKEN_TABLE = os.environ.get("SUPABASE_TOKEN_TABLE", "user_tokens")
 PROJECT_TABLE = os.environ.get("SUPABASE_PROJECT_TABLE", "user_projects")
 GENERATED_TABLE = os.environ.get("SUPABASE_GENERATED_TABLE", "generated_images")
 STORAGE_BUCKET = os.environ.get("SUPABASE_STORAGE_BUCKET", "generated")
 DEFAULT_PROJECT_NAME = os.environ.get("SUPABASE_DEFAULT_PROJECT_NAME", "Default Project")
+UPLOAD_WORKERS = int(os.environ.get("SUPABASE_UPLOAD_WORKERS", "8"))
 
 # Load environment variables defined in .env (if present).
 load_dotenv()
 
+JWT_VERIFY = os.environ.get("SUPABASE_JWT_VERIFY", "true").lower() in ("1", "true", "yes")
+JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWT_ALGORITHMS = ("HS256", "RS256", "ES256")
+JWKS_REFRESH_SECONDS = int(os.environ.get("SUPABASE_JWKS_REFRESH_SECONDS", "600"))
+JWT_CACHE_SIZE = int(os.environ.get("SUPABASE_JWT_CACHE_SIZE", "1024"))
+TOKEN_BALANCE_TTL_SECONDS = float(os.environ.get("SUPABASE_TOKEN_BALANCE_TTL", "10"))
+TOKEN_BALANCE_CACHE_SIZE = int(os.environ.get("SUPABASE_TOKEN_BALANCE_CACHE_SIZE", "4096"))
+ASSET_PAGE_COLUMNS = "id,project_id,image_type,image_url,created_at"
+ASSET_PAGE_MAX_LIMIT = 100
+DEFAULT_PROJECT_CACHE_SIZE = int(os.environ.get("SUPABASE_DEFAULT_PROJECT_CACHE_SIZE", "4096"))
+
 
 def _get_env_variable(key: str) -> str:
     """Fetch an environment variable and fail fast if it's missing."""
@@ -69,10 +91,102 @@ def get_supabase_anon_client() -> Client:
     return create_client(supabase_url, anon_key)
 
 
+class TokenValidator:
+    """
+    Verify Supabase access tokens locally, without a round trip to GoTrue.
+
+    HS256 tokens are checked against the project's JWT secret
+    (`SUPABASE_JWT_SECRET`); asymmetric tokens (RS256/ES256) against the
+    project's JWKS, which is fetched once and refreshed every
+    `jwks_refresh_seconds`. Successfully verified claims are kept in a small
+    LRU keyed by the SHA-256 of the token until the token's `exp`, so repeat
+    requests with the same token skip signature verification entirely.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: Optional[str] = JWT_AUDIENCE,
+        jwks_refresh_seconds: int = JWKS_REFRESH_SECONDS,
+        cache_size: int = JWT_CACHE_SIZE,
+    ):
+        self.jwt_secret = jwt_secret
+        self.audience = audience or None
+        self.cache_size = cache_size
+        self._jwks_client = (
+            jwt.PyJWKClient(jwks_url, cache_jwk_set=True, lifespan=jwks_refresh_seconds)
+            if jwks_url
+            else None
+        )
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached_claims(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._cache.get(cache_key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            return claims
+
+    def _remember(self, cache_key: str, claims: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[cache_key] = claims
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _signing_key(self, access_token: str, algorithm: str):
+        if algorithm == "HS256":
+            if not self.jwt_secret:
+                raise jwt.InvalidTokenError("SUPABASE_JWT_SECRET is not configured for HS256 tokens.")
+            return self.jwt_secret
+        if self._jwks_client is None:
+            raise jwt.InvalidTokenError(f"No JWKS configured for {algorithm} tokens.")
+        return self._jwks_client.get_signing_key_from_jwt(access_token).key
+
+    def validate(self, access_token: str) -> Dict[str, Any]:
+        """Return the verified claims or raise `jwt.InvalidTokenError`."""
+        cache_key = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+        claims = self._cached_claims(cache_key)
+        if claims is not None:
+            return claims
+
+        algorithm = jwt.get_unverified_header(access_token).get("alg")
+        if algorithm not in JWT_ALGORITHMS:
+            raise jwt.InvalidTokenError(f"Unsupported token algorithm: {algorithm}")
+        claims = jwt.decode(
+            access_token,
+            self._signing_key(access_token, algorithm),
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={"require": ["exp", "sub"], "verify_aud": bool(self.audience)},
+        )
+        self._remember(cache_key, claims)
+        return claims
+
+
+@lru_cache(maxsize=1)
+def get_token_validator() -> TokenValidator:
+    """Return the process-wide TokenValidator configured from the environment."""
+    supabase_url = _get_env_variable("SUPABASE_URL").rstrip("/")
+    return TokenValidator(
+        jwt_secret=os.environ.get("SUPABASE_JWT_SECRET"),
+        jwks_url=f"{supabase_url}/auth/v1/.well-known/jwks.json",
+    )
+
+
 def validate_access_token(access_token: str) -> Dict[str, Any]:
     """
     Validate a Supabase JWT access token and return its claims.
 
+    The signature is verified locally (see `TokenValidator`). Set
+    `SUPABASE_JWT_VERIFY=false` to skip verification in local development.
+
     Parameters
     ----------
     access_token:
@@ -85,22 +199,19 @@ def validate_access_token(access_token: str) -> Dict[str, Any]:
 
     Raises
     ------
-    jwt.InvalidTokenError
-        If the token is invalid, expired, or cannot be decoded.
     ValueError
-        If the access token is missing.
+        If the access token is missing, invalid, expired, or cannot be decoded.
     """
     if not access_token:
         raise ValueError("Access token is required for validation.")
 
-    # Decode JWT without verification (for development)
-    # In production, you should verify the signature using Supabase's JWT secret
     try:
-        # Decode without verification for now (development mode)
-        # In production, use: jwt.decode(access_token, jwt_secret, algorithms=["HS256"])
-        decoded = jwt.decode(access_token, options={"verify_signature": False})
-        return decoded
-    except jwt.InvalidTokenError as e:
+        if not JWT_VERIFY:
+            # 개발 모드: 서명 검증 생략
+            return jwt.decode(access_token, options={"verify_signature": False})
+        return get_token_validator().validate(access_token)
+    except jwt.PyJWTError as e:
+        # InvalidTokenError 외에 JWKS 조회 실패(PyJWKClientError)도 포함
         raise ValueError(f"Invalid access token: {str(e)}")
 
 
@@ -139,6 +250,25 @@ def upload_file_to_storage(
     return response
 
 
+def upload_bytes_to_storage(
+    data: bytes,
+    storage_path: str,
+    bucket: str = "generated",
+    content_type: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Upload an in-memory encoded file to Supabase Storage without touching disk.
+
+    Same as `upload_file_to_storage`, but takes the file contents directly.
+    """
+    client = get_supabase_admin_client()
+    return client.storage.from_(bucket).upload(
+        storage_path,
+        bytes(data),
+        file_options={"content-type": content_type} if content_type else None,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Authentication helpers
 # ---------------------------------------------------------------------------
@@ -169,17 +299,66 @@ def sign_out_user() -> None:
 # Token & project utilities
 # ---------------------------------------------------------------------------
 
+class _TTLCache:
+    """Small thread-safe LRU whose entries optionally expire after `ttl_seconds`."""
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# 워커 프로세스마다 따로 유지되므로 짧은 TTL로 다른 워커의 차감과의 불일치를 제한
+_token_balance_cache = _TTLCache(TOKEN_BALANCE_CACHE_SIZE, TOKEN_BALANCE_TTL_SECONDS)
+
+
 def ensure_user_token_balance(user_id: str, initial_tokens: int = DEFAULT_TOKEN_COUNT) -> int:
     """
     Ensure a token row exists for the user and return the current balance.
+
+    Balances are served from a short-lived in-process cache
+    (`SUPABASE_TOKEN_BALANCE_TTL` seconds) that `consume_user_token` updates
+    write-through. The authoritative check happens in `consume_tokens`.
     """
+    cached = _token_balance_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     client = get_supabase_admin_client()
     response = client.table(TOKEN_TABLE).select("tokens").eq("user_id", user_id).execute()
     data = response.data or []
     if not data:
         client.table(TOKEN_TABLE).insert({"user_id": user_id, "tokens": initial_tokens}).execute()
-        return initial_tokens
-    return int(data[0]["tokens"])
+        balance = initial_tokens
+    else:
+        balance = int(data[0]["tokens"])
+    _token_balance_cache.set(user_id, balance)
+    return balance
 
 
 def get_user_token_balance(user_id: str) -> int:
@@ -187,78 +366,312 @@ def get_user_token_balance(user_id: str) -> int:
     return ensure_user_token_balance(user_id)
 
 
+def _tokens_rpc(function_name: str, user_id: str, amount: int) -> Optional[int]:
+    client = get_supabase_admin_client()
+    response = client.rpc(function_name, {"p_user_id": user_id, "p_amount": amount}).execute()
+    data = response.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = data.get(function_name)
+    return None if data is None else int(data)
+
+
+def _consume_tokens_rpc(user_id: str, amount: int) -> Optional[int]:
+    return _tokens_rpc("consume_tokens", user_id, amount)
+
+
 def consume_user_token(user_id: str, amount: int = 1) -> int:
     """
     Decrement the user's token balance by `amount`.
 
+    The check and the decrement happen atomically in the `consume_tokens`
+    Postgres function (see `supabase_schema.sql`), so concurrent requests
+    cannot overspend and the common path is a single round trip.
+
     Returns the remaining token count.
     """
-    client = get_supabase_admin_client()
-    current = ensure_user_token_balance(user_id)
-    if current < amount:
-        raise ValueError("Insufficient tokens.")
-    new_balance = current - amount
-    client.table(TOKEN_TABLE).update({"tokens": new_balance}).eq("user_id", user_id).execute()
+    new_balance = _consume_tokens_rpc(user_id, amount)
+    if new_balance is None:
+        # 잔액 부족 또는 토큰 행이 아직 없음 - 캐시를 무시하고 행을 만든 뒤 한 번만 다시 시도
+        _token_balance_cache.invalidate(user_id)
+        if ensure_user_token_balance(user_id) >= amount:
+            new_balance = _consume_tokens_rpc(user_id, amount)
+        if new_balance is None:
+            raise ValueError("Insufficient tokens.")
+    _token_balance_cache.set(user_id, new_balance)
     return new_balance
 
 
+def refund_user_token(user_id: str, amount: int = 1) -> Optional[int]:
+    """
+    Give back `amount` tokens reserved by `consume_user_token` for work that failed.
+
+    Returns the new balance, or None if the user has no token row.
+    """
+    new_balance = _tokens_rpc("refund_tokens", user_id, amount)
+    if new_balance is None:
+        _token_balance_cache.invalidate(user_id)
+    else:
+        _token_balance_cache.set(user_id, new_balance)
+    return new_balance
+
+
+# 기본 프로젝트 ID는 바뀌지 않으므로 만료 없이 LRU로만 제한
+_default_project_cache = _TTLCache(DEFAULT_PROJECT_CACHE_SIZE)
+# 사용자별 조회/생성을 직렬화하는 잠금 (고정 개수로 분산해 메모리가 늘지 않음)
+_default_project_locks = [threading.Lock() for _ in range(64)]
+
+
 def _ensure_default_project(user_id: str) -> str:
-    """Return a default project_id for the user, creating one if needed."""
-    client = get_supabase_admin_client()
-    response = (
-        client.table(PROJECT_TABLE)
-        .select("id")
-        .eq("user_id", user_id)
-        .eq("project_name", DEFAULT_PROJECT_NAME)
-        .limit(1)
-        .execute()
-    )
-    data = response.data or []
-    if data:
-        return data[0]["id"]
+    """
+    Return a default project_id for the user, creating one if needed.
 
-    project_id = str(uuid.uuid4())
-    client.table(PROJECT_TABLE).insert(
-        {
-            "id": project_id,
-            "user_id": user_id,
-            "project_name": DEFAULT_PROJECT_NAME,
-            "created_at": datetime.utcnow().isoformat(),
-        }
-    ).execute()
-    return project_id
+    Results are memoized per user. Concurrent first calls for the same user
+    are single-flighted, so parallel requests cannot insert duplicate
+    default projects.
+    """
+    project_id = _default_project_cache.get(user_id)
+    if project_id:
+        return project_id
+
+    with _default_project_locks[hash(user_id) % len(_default_project_locks)]:
+        project_id = _default_project_cache.get(user_id)
+        if project_id:
+            return project_id
+
+        client = get_supabase_admin_client()
+        response = (
+            client.table(PROJECT_TABLE)
+            .select("id")
+            .eq("user_id", user_id)
+            .eq("project_name", DEFAULT_PROJECT_NAME)
+            .order("created_at")
+            .limit(1)
+            .execute()
+        )
+        data = response.data or []
+        if data:
+            project_id = data[0]["id"]
+        else:
+            project_id = str(uuid.uuid4())
+            client.table(PROJECT_TABLE).insert(
+                {
+                    "id": project_id,
+                    "user_id": user_id,
+                    "project_name": DEFAULT_PROJECT_NAME,
+                    "created_at": datetime.utcnow().isoformat(),
+                }
+            ).execute()
+        _default_project_cache.set(user_id, project_id)
+        return project_id
 
 
 def record_generated_image(
     user_id: str,
     image_type: str,
-    local_path: str,
+    local_path: Union[str, Any],
     metadata: Optional[Dict[str, Any]] = None,
     project_id: Optional[str] = None,
 ) -> str:
     """
     Upload the generated image to Supabase Storage and log it in Postgres.
 
+    `local_path` is either a file path or an in-memory encoded image exposing
+    `file_name` and `data` (see `EncodedImage`), which is uploaded directly.
+
+    The row is handed to the background recorder (see `image_recorder`) unless
+    `SUPABASE_RECORD_DEFERRED=false`, so the caller does not wait for the
+    INSERT; the returned public URL is already valid since the upload is done.
+
     Returns the public URL for the stored asset.
     """
-    client = get_supabase_admin_client()
     project_id = project_id or _ensure_default_project(user_id)
-    file_name = os.path.basename(local_path)
-    storage_path = f"{user_id}/{project_id}/{file_name}"
-    upload_file_to_storage(local_path, storage_path, bucket=STORAGE_BUCKET, content_type="image/png")
-    public_url = client.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
+    public_url = _upload_generated_image(user_id, project_id, local_path)
 
     payload = {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "project_id": project_id,
         "image_type": image_type,
         "image_url": public_url,
         "metadata": metadata or {},
+        "created_at": datetime.utcnow().isoformat(),
     }
-    client.table(GENERATED_TABLE).insert(payload).execute()
+    _write_generated_rows([payload])
     return public_url
 
 
+def _insert_generated_rows(rows: List[Dict[str, Any]]) -> None:
+    """Bulk-insert generated_images rows; rows already present (same id) are skipped."""
+    client = get_supabase_admin_client()
+    client.table(GENERATED_TABLE).upsert(rows, on_conflict="id", ignore_duplicates=True).execute()
+
+
+@lru_cache(maxsize=1)
+def get_generated_image_recorder() -> DeferredRowRecorder:
+    """Return the process-wide background recorder for generated_images rows."""
+    return DeferredRowRecorder(_insert_generated_rows, RECORD_SPOOL_PATH)
+
+
+def _write_generated_rows(rows: List[Dict[str, Any]]) -> None:
+    # 기본: 로컬 스풀에 기록한 뒤 백그라운드에서 묶어서 INSERT (응답을 기다리게 하지 않음)
+    if RECORD_DEFERRED:
+        get_generated_image_recorder().enqueue(rows)
+    else:
+        _insert_generated_rows(rows)
+
+
+def _upload_generated_image(user_id: str, project_id: str, local_path: Union[str, Any]) -> str:
+    """Upload one generated image (path or in-memory encoded image) and return its public URL."""
+    client = get_supabase_admin_client()
+    file_name = os.path.basename(local_path) if isinstance(local_path, str) else local_path.file_name
+    storage_path = f"{user_id}/{project_id}/{file_name}"
+    # 애니메이션 미리보기(WebP/GIF) 등 PNG가 아닌 결과도 올바른 MIME 타입으로 저장
+    content_type = mimetypes.guess_type(file_name)[0] or "image/png"
+    if isinstance(local_path, str):
+        upload_file_to_storage(local_path, storage_path, bucket=STORAGE_BUCKET, content_type=content_type)
+    else:
+        upload_bytes_to_storage(local_path.data, storage_path, bucket=STORAGE_BUCKET, content_type=content_type)
+    return client.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
+
+
+def record_generated_images(
+    user_id: str,
+    images: Sequence[Tuple[str, Union[str, Any], Optional[Dict[str, Any]]]],
+    project_id: Optional[str] = None,
+) -> List[str]:
+    """
+    Upload several generated images concurrently and log them with one bulk insert.
+
+    Parameters
+    ----------
+    images:
+        `(image_type, local_path, metadata)` tuples, e.g. every frame of an
+        animation followed by its combined sheet. `local_path` may also be an
+        in-memory encoded image, as in `record_generated_image`.
+
+    Returns
+    -------
+    list
+        Public URLs in the same order as `images`. Rows are timestamped in
+        that order too, so the last image becomes the user's latest asset.
+    """
+    if not images:
+        return []
+    project_id = project_id or _ensure_default_project(user_id)
+
+    # 업로드는 공유 클라이언트의 HTTP 커넥션 풀을 통해 동시에 진행
+    workers = max(1, min(UPLOAD_WORKERS, len(images)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as executor:
+        public_urls = list(
+            executor.map(lambda image: _upload_generated_image(user_id, project_id, image[1]), images)
+        )
+
+    created_at = datetime.utcnow()
+    payload = [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "project_id": project_id,
+            "image_type": image_type,
+            "image_url": public_url,
+            "metadata": metadata or {},
+            "created_at": (created_at + timedelta(microseconds=index)).isoformat(),
+        }
+        for index, ((image_type, _path, metadata), public_url) in enumerate(zip(images, public_urls))
+    ]
+    _write_generated_rows(payload)
+    return public_urls
+
+
+def upload_generated_files(user_id: str, paths: Sequence[str], project_id: Optional[str] = None) -> List[str]:
+    """
+    Upload companion files of a result (e.g. atlas JSON/XML) next to its images.
+
+    Unlike `record_generated_images` no generated_images rows are written.
+    Returns public URLs in the same order as `paths`.
+    """
+    if not paths:
+        return []
+    project_id = project_id or _ensure_default_project(user_id)
+    workers = max(1, min(UPLOAD_WORKERS, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as executor:
+        return list(executor.map(lambda path: _upload_generated_image(user_id, project_id, path), paths))
+
+
+def encode_asset_cursor(created_at: str, row_id: str) -> str:
+    """Encode the `(created_at, id)` of the last row on a page as an opaque cursor."""
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_asset_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor from `encode_asset_cursor`. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        # 필터 문자열에 그대로 들어가므로 형식을 검증
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor.") from exc
+    return created_at, row_id
+
+
+def list_generated_images(
+    user_id: str,
+    limit: int = 24,
+    cursor: Optional[str] = None,
+    image_type: Optional[str] = None,
+    project_id: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Return one page of the user's generated images, newest first.
+
+    Pages use keyset pagination on `(created_at, id)`, never an OFFSET scan.
+    The cursor adds a plain `created_at <= X` bound next to the row filter, so
+    Postgres starts an index range scan on `idx_generated_images_user_cursor`
+    at the cursor instead of at the user's newest row, no matter how deep the
+    client pages. Only `ASSET_PAGE_COLUMNS` are fetched.
+
+    Returns
+    -------
+    tuple
+        `(rows, next_cursor)`; `next_cursor` is None on the last page.
+    """
+    limit = max(1, min(limit, ASSET_PAGE_MAX_LIMIT))
+    client = get_supabase_admin_client()
+    query = client.table(GENERATED_TABLE).select(ASSET_PAGE_COLUMNS).eq("user_id", user_id)
+    if image_type:
+        query = query.eq("image_type", image_type)
+    if project_id:
+        try:
+            uuid.UUID(project_id)
+        except ValueError as exc:
+            raise ValueError("Invalid project_id.") from exc
+        query = query.eq("project_id", project_id)
+    if cursor:
+        created_at, row_id = decode_asset_cursor(cursor)
+        # OR 조건만으로는 인덱스 시작 위치를 정할 수 없으므로 범위 조건을 함께 지정
+        query = query.lte("created_at", created_at).or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    # 한 행을 더 읽어 다음 페이지 존재 여부를 판단
+    response = (
+        query.order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
+        .execute()
+    )
+    rows = response.data or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_asset_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
 def get_last_generated_image_url(user_id: str) -> Optional[str]:
     """Fetch the most recent image URL stored for the user."""
     client = get_supabase_admin_client()
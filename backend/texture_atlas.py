@@ -0,0 +1,244 @@
+"""
+텍스처 아틀라스 패커 - 프레임을 알파 영역으로 잘라 MaxRects로 빈틈없이 배치
+
+Gemini frames are full-canvas images with large transparent margins. Each
+frame is trimmed to its alpha bounding box and the trimmed sprites are
+packed with the MaxRects algorithm (best short side fit) into the smallest
+power-of-two atlas that holds them. Alongside the atlas PNG we write:
+
+- `<atlas>.json`: TexturePacker "JSON Hash" layout (frame, trimmed,
+  spriteSourceSize, sourceSize, pivot), read by Phaser (`load.atlas`) and
+  by the common Unity/Godot TexturePacker importers.
+- `<atlas>.xml`: Starling/Sparrow `TextureAtlas` layout with frameX/frameY
+  offsets (Phaser `load.atlasXML`, Godot and Unity Sparrow importers).
+
+The offsets let engines put each trimmed sprite back where it was in the
+original frame, so animations stay aligned.
+"""
+
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from .animation_export import derived_output_base, split_animation_result
+
+# Load environment variables before reading atlas settings
+load_dotenv()
+
+ATLAS_MAX_SIZE = int(os.getenv("ATLAS_MAX_SIZE", "4096"))
+ATLAS_PADDING = int(os.getenv("ATLAS_PADDING", "2"))
+
+
+class PackedSprite(NamedTuple):
+    """One trimmed sprite and where it sits in the atlas and in its source frame."""
+    name: str
+    image: Image.Image
+    x: int
+    y: int
+    trim_x: int
+    trim_y: int
+    source_width: int
+    source_height: int
+
+
+class MaxRectsBin:
+    """MaxRects bin packer using the best-short-side-fit heuristic (no rotation)."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free_rects: List[Tuple[int, int, int, int]] = [(0, 0, width, height)]
+
+    def insert(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        best = None
+        best_score = None
+        for free_x, free_y, free_w, free_h in self.free_rects:
+            if width <= free_w and height <= free_h:
+                leftover_w, leftover_h = free_w - width, free_h - height
+                score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+                if best_score is None or score < best_score:
+                    best, best_score = (free_x, free_y), score
+        if best is None:
+            return None
+        self._place((best[0], best[1], width, height))
+        return best
+
+    def _place(self, used: Tuple[int, int, int, int]) -> None:
+        used_x, used_y, used_w, used_h = used
+        next_free = []
+        for rect in self.free_rects:
+            free_x, free_y, free_w, free_h = rect
+            if (used_x >= free_x + free_w or used_x + used_w <= free_x
+                    or used_y >= free_y + free_h or used_y + used_h <= free_y):
+                next_free.append(rect)
+                continue
+            # 겹치는 빈 영역을 배치된 사각형 바깥쪽의 최대 사각형들로 분할
+            if used_x > free_x:
+                next_free.append((free_x, free_y, used_x - free_x, free_h))
+            if used_x + used_w < free_x + free_w:
+                next_free.append((used_x + used_w, free_y, free_x + free_w - used_x - used_w, free_h))
+            if used_y > free_y:
+                next_free.append((free_x, free_y, free_w, used_y - free_y))
+            if used_y + used_h < free_y + free_h:
+                next_free.append((free_x, used_y + used_h, free_w, free_y + free_h - used_y - used_h))
+        self.free_rects = [
+            rect for index, rect in enumerate(next_free)
+            if not any(index != other_index and _contains(other, rect) and (other != rect or other_index < index)
+                       for other_index, other in enumerate(next_free))
+        ]
+
+
+def _contains(outer, inner) -> bool:
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and outer[0] + outer[2] >= inner[0] + inner[2] and outer[1] + outer[3] >= inner[1] + inner[3])
+
+
+def _trim(name: str, path: str):
+    with Image.open(path) as source:
+        image = source.convert("RGBA")
+    bbox = image.getchannel("A").getbbox() or (0, 0, 1, 1)
+    return name, image.crop(bbox), bbox[0], bbox[1], image.width, image.height
+
+
+def _candidate_sizes(min_area: int, min_width: int, min_height: int):
+    sizes = []
+    side = 32
+    sides = []
+    while side <= ATLAS_MAX_SIZE:
+        sides.append(side)
+        side *= 2
+    for width in sides:
+        for height in sides:
+            if width >= min_width and height >= min_height and width * height >= min_area:
+                sizes.append((width * height, max(width, height), width, height))
+    return [(width, height) for _area, _side, width, height in sorted(sizes)]
+
+
+def pack_sprites(frames: Sequence[Tuple[str, str]], padding: int = ATLAS_PADDING):
+    """
+    Trim and pack `(name, path)` frames. Returns `(atlas_width, atlas_height, sprites)`.
+
+    Raises ValueError when the frames do not fit into ATLAS_MAX_SIZE.
+    """
+    trimmed = [_trim(name, path) for name, path in frames]
+    if not trimmed:
+        raise ValueError("No frames to pack.")
+    # 큰 스프라이트부터 배치해야 빈 공간이 적게 남음
+    order = sorted(range(len(trimmed)), key=lambda i: max(trimmed[i][1].size), reverse=True)
+    min_area = sum((image.width + padding) * (image.height + padding) for _n, image, *_rest in trimmed)
+    min_width = max(image.width for _n, image, *_rest in trimmed) + padding
+    min_height = max(image.height for _n, image, *_rest in trimmed) + padding
+
+    for atlas_width, atlas_height in _candidate_sizes(min_area, min_width, min_height):
+        packer = MaxRectsBin(atlas_width, atlas_height)
+        positions = {}
+        for index in order:
+            image = trimmed[index][1]
+            position = packer.insert(image.width + padding, image.height + padding)
+            if position is None:
+                break
+            positions[index] = position
+        else:
+            sprites = [
+                PackedSprite(name, image, positions[index][0], positions[index][1],
+                             trim_x, trim_y, source_width, source_height)
+                for index, (name, image, trim_x, trim_y, source_width, source_height) in enumerate(trimmed)
+            ]
+            return atlas_width, atlas_height, sprites
+    raise ValueError(f"Frames do not fit into a {ATLAS_MAX_SIZE}x{ATLAS_MAX_SIZE} atlas.")
+
+
+def _json_hash(sprites: List[PackedSprite], image_name: str, width: int, height: int,
+               pivot: Tuple[float, float]) -> Dict:
+    frames = {}
+    for sprite in sprites:
+        frames[sprite.name] = {
+            "frame": {"x": sprite.x, "y": sprite.y, "w": sprite.image.width, "h": sprite.image.height},
+            "rotated": False,
+            "trimmed": sprite.image.size != (sprite.source_width, sprite.source_height),
+            "spriteSourceSize": {
+                "x": sprite.trim_x, "y": sprite.trim_y, "w": sprite.image.width, "h": sprite.image.height,
+            },
+            "sourceSize": {"w": sprite.source_width, "h": sprite.source_height},
+            "pivot": {"x": pivot[0], "y": pivot[1]},
+        }
+    return {
+        "frames": frames,
+        "meta": {
+            "app": "2D-Game-Asset-Generator",
+            "version": "1.0",
+            "image": image_name,
+            "format": "RGBA8888",
+            "size": {"w": width, "h": height},
+            "scale": "1",
+        },
+    }
+
+
+def _sparrow_xml(sprites: List[PackedSprite], image_name: str) -> bytes:
+    root = ElementTree.Element("TextureAtlas", imagePath=image_name)
+    for sprite in sprites:
+        ElementTree.SubElement(
+            root, "SubTexture",
+            name=sprite.name,
+            x=str(sprite.x), y=str(sprite.y),
+            width=str(sprite.image.width), height=str(sprite.image.height),
+            # Sparrow 형식은 원본 프레임 안에서의 위치를 음수 오프셋으로 표기
+            frameX=str(-sprite.trim_x), frameY=str(-sprite.trim_y),
+            frameWidth=str(sprite.source_width), frameHeight=str(sprite.source_height),
+        )
+    ElementTree.indent(root)
+    return ElementTree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def atlas_descriptor_paths(atlas_path: str) -> Dict[str, str]:
+    """Paths of the JSON Hash and Sparrow XML descriptors written next to an atlas PNG."""
+    base_path = os.path.splitext(atlas_path)[0]
+    return {"json": base_path + ".json", "xml": base_path + ".xml"}
+
+
+def build_texture_atlas(frames: Sequence[Tuple[str, str]], output_path: str,
+                        pivot: Tuple[float, float] = (0.5, 0.5), padding: int = ATLAS_PADDING) -> Dict:
+    """
+    Pack `(name, path)` frames into an atlas PNG at `output_path`.
+
+    Writes `<output_path minus .png>.json` and `.xml` next to it and returns
+    the JSON Hash metadata as a dict.
+    """
+    width, height, sprites = pack_sprites(frames, padding)
+    atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for sprite in sprites:
+        atlas.paste(sprite.image, (sprite.x, sprite.y))
+    atlas.save(output_path, "PNG", optimize=True)
+
+    image_name = os.path.basename(output_path)
+    metadata = _json_hash(sprites, image_name, width, height, pivot)
+    descriptors = atlas_descriptor_paths(output_path)
+    with open(descriptors["json"], "w", encoding="utf-8") as json_file:
+        json.dump(metadata, json_file, indent=2)
+    with open(descriptors["xml"], "wb") as xml_file:
+        xml_file.write(_sparrow_xml(sprites, image_name))
+
+    print(f"✅ Texture atlas saved: {output_path} ({len(sprites)} sprites, {width}x{height})")
+    return metadata
+
+
+def build_animation_atlas(image_paths: Sequence[str], action_type: str):
+    """
+    Pack the generated frames of an animation result into a texture atlas.
+
+    Frames are named `<action_type>_<index>` and the atlas is written next
+    to the combined sheet as `*_atlas_*.png` (+ `.json`/`.xml`). Returns
+    `(atlas_path, metadata)`, or `(None, None)` when there are no frames.
+    """
+    frame_paths, sheet_path = split_animation_result(image_paths)
+    if not frame_paths:
+        return None, None
+    output_path = derived_output_base(frame_paths, sheet_path, "atlas") + ".png"
+    frames = [(f"{action_type}_{index:02d}", path) for index, path in enumerate(frame_paths)]
+    # 피벗은 발 위치(하단 중앙) 기준이라 엔진에서 프레임 간 정렬이 유지됨
+    return output_path, build_texture_atlas(frames, output_path, pivot=(0.5, 1.0))
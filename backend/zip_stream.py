@@ -0,0 +1,79 @@
+"""
+스트리밍 ZIP 생성기 - 디스크에 임시 파일을 만들지 않고 ZIP을 조각 단위로 전송
+
+PNG/WebP frames are already compressed, so entries are written with
+ZIP_STORED (no DEFLATE pass). `zipfile` writes to a non-seekable sink, so it
+emits data descriptors after each entry instead of seeking back to patch
+the local headers. Each chunk is yielded as soon as it is written, so
+memory use is bounded by ZIP_CHUNK_BYTES no matter how many frames the
+archive holds. The generator can be passed straight to a FastAPI
+`StreamingResponse`.
+"""
+
+import io
+import os
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables before reading stream settings
+load_dotenv()
+
+ZIP_CHUNK_BYTES = int(os.getenv("ZIP_CHUNK_BYTES", str(256 * 1024)))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that hands written bytes back via `drain()`."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+def iter_zip(entries: Iterable[Tuple[str, str]], chunk_size: int = ZIP_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `(arcname, path)` entries chunk by chunk.
+
+    Files are read `chunk_size` bytes at a time and stored uncompressed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, "rb") as source, archive.open(info, "w") as target:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # 닫을 때 기록된 중앙 디렉터리
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def write_zip(entries: Iterable[Tuple[str, str]], output_path: str) -> str:
+    """Write the same stored archive to `output_path` (for callers that need a file, e.g. Gradio)."""
+    with open(output_path, "wb") as output_file:
+        for chunk in iter_zip(entries):
+            output_file.write(chunk)
+    return output_path
@@ -78,6 +78,13 @@ CREATE INDEX IF NOT EXISTS idx_generated_images_created_at
     ON public.generated_images(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_generated_images_user_created 
     ON public.generated_images(user_id, created_at DESC);
+-- GET /assets 키셋 페이지네이션 (created_at, id) 용
+CREATE INDEX IF NOT EXISTS idx_generated_images_user_cursor 
+    ON public.generated_images(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_generated_images_user_type_cursor 
+    ON public.generated_images(user_id, image_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_generated_images_project_cursor 
+    ON public.generated_images(project_id, created_at DESC, id DESC);
 
 -- RLS 정책 설정
 ALTER TABLE public.generated_images ENABLE ROW LEVEL SECURITY;
@@ -111,13 +118,45 @@ CREATE TRIGGER update_user_projects_updated_at
     EXECUTE FUNCTION public.handle_updated_at();
 
 -- =====================================================
--- 5. 스토리지 버킷 생성 (Storage > Buckets에서 수동 생성 권장)
+-- 5. 토큰 차감 함수 (원자적 차감, 한 번의 왕복)
+-- =====================================================
+-- 잔액이 충분할 때만 차감하고 새 잔액을 반환 (부족하거나 행이 없으면 NULL)
+-- 동시 요청에서도 조건부 UPDATE 한 문장으로 처리되므로 경쟁 상태가 없음
+CREATE OR REPLACE FUNCTION public.consume_tokens(p_user_id UUID, p_amount INTEGER DEFAULT 1)
+RETURNS INTEGER AS $$
+    UPDATE public.user_tokens
+    SET tokens = tokens - p_amount
+    WHERE user_id = p_user_id
+      AND p_amount > 0
+      AND tokens >= p_amount
+    RETURNING tokens;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- 백엔드(서비스 역할 키)에서만 호출 가능
+REVOKE EXECUTE ON FUNCTION public.consume_tokens(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.consume_tokens(UUID, INTEGER) TO service_role;
+
+-- 미리 차감한 토큰을 생성 실패 시 되돌림 (새 잔액 반환, 행이 없으면 NULL)
+CREATE OR REPLACE FUNCTION public.refund_tokens(p_user_id UUID, p_amount INTEGER DEFAULT 1)
+RETURNS INTEGER AS $$
+    UPDATE public.user_tokens
+    SET tokens = tokens + p_amount
+    WHERE user_id = p_user_id
+      AND p_amount > 0
+    RETURNING tokens;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.refund_tokens(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refund_tokens(UUID, INTEGER) TO service_role;
+
+-- =====================================================
+-- 6. 스토리지 버킷 생성 (Storage > Buckets에서 수동 생성 권장)
 -- =====================================================
 -- 참고: Supabase Dashboard > Storage > Create Bucket에서 수동으로 생성하세요
 -- 버킷 이름: "generated"
 -- Public bucket: Yes (공개 URL 접근 필요)
 -- File size limit: 원하는 최대 크기 (예: 10MB)
--- Allowed MIME types: image/png, image/jpeg, image/jpg, image/gif, image/webp
+-- Allowed MIME types: image/png, image/jpeg, image/jpg, image/gif, image/webp, application/json, application/xml
 
 -- 또는 SQL로 생성하려면:
 -- INSERT INTO storage.buckets (id, name, public, file_size_limit, allowed_mime_types)
@@ -126,11 +165,11 @@ CREATE TRIGGER update_user_projects_updated_at
 --     'generated',
 --     true,
 --     10485760, -- 10MB
---     ARRAY['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp']
+--     ARRAY['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp', 'application/json', 'application/xml']
 -- );
 
 -- =====================================================
--- 6. 스토리지 정책 설정 (Storage RLS)
+-- 7. 스토리지 정책 설정 (Storage RLS)
 -- =====================================================
 -- Storage > Policies에서 수동으로 설정하거나 아래 SQL 사용:
 
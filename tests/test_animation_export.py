@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image
+
+from backend.animation_export import export_animation
+
+COLORS = [(255, 255, 255, 255), (255, 0, 0, 255), (0, 0, 255, 255)]
+
+
+@pytest.mark.parametrize("export_format, extension", [("webp", ".webp"), ("apng", ".png"), ("gif", ".gif")])
+def test_distinct_opaque_frames_are_kept(tmp_path, export_format, extension):
+    frames = [Image.new("RGBA", (8, 8), color) for color in COLORS]
+    output_path = export_animation(frames, str(tmp_path / f"preview{extension}"), export_format)
+
+    with Image.open(output_path) as animation:
+        assert animation.n_frames == len(COLORS)
+
+
+def test_identical_frames_are_merged(tmp_path):
+    frames = [Image.new("RGBA", (8, 8), COLORS[1])] * 3
+    output_path = export_animation(frames, str(tmp_path / "preview.webp"), "webp")
+
+    with Image.open(output_path) as animation:
+        assert animation.n_frames == 1
+
+
+def test_gif_keeps_dark_opaque_pixels_opaque(tmp_path):
+    # 1024 bright colors fill the palette, so the single dark pixel has no entry of its own
+    frame = Image.new("RGBA", (32, 32))
+    frame.putdata([(128 + x * 4, 128 + y * 4, 200, 255) for y in range(32) for x in range(32)])
+    frame.putpixel((0, 0), (1, 1, 1, 255))
+    output_path = export_animation([frame], str(tmp_path / "preview.gif"), "gif")
+
+    with Image.open(output_path) as animation:
+        assert animation.convert("RGBA").getpixel((0, 0))[3] == 255
+
+
+def test_gif_keeps_transparent_pixels_transparent(tmp_path):
+    frame = Image.new("RGBA", (8, 8), (255, 0, 0, 255))
+    frame.paste((0, 0, 0, 0), (4, 0, 8, 8))
+    output_path = export_animation([frame], str(tmp_path / "preview.gif"), "gif")
+
+    with Image.open(output_path) as animation:
+        rgba = animation.convert("RGBA")
+        assert rgba.getpixel((1, 1)) == (255, 0, 0, 255)
+        assert rgba.getpixel((6, 1))[3] == 0